@@ -3,15 +3,23 @@ import sys
 import os
 import re
 import io
+import tempfile
 import json
+import orjson
 import hashlib
 import hmac
 import secrets
+import random
 import time
 import smtplib
+import traceback
 from datetime import datetime, timezone, timedelta
-from functools import wraps
-from threading import Lock
+from functools import wraps, lru_cache
+from html import escape as html_escape
+from threading import Lock, Event, Thread, current_thread
+from queue import Queue, Empty
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
 
 # Load environment variables FIRST
 from dotenv import load_dotenv
@@ -19,16 +27,22 @@ load_dotenv()
 
 # Flask imports
 from flask import Flask, render_template, request, jsonify, send_file, redirect, url_for
+from flask.json.provider import DefaultJSONProvider
 
 # Web scraping
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from lxml import etree, html as lxml_html
+
+# In-process TTL caches
+from cachetools import TTLCache, cached
 
 # ✅ psycopg 3.x imports (Python 3.14 compatible)
 import psycopg
 from psycopg_pool import ConnectionPool
 
 # PDF Generation
+from reportlab import rl_config
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
@@ -37,6 +51,7 @@ from reportlab.lib.units import inch, cm, mm
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
 from reportlab.pdfgen import canvas
 from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase.pdfmetrics import stringWidth
 
 # Google Sheets
 import gspread
@@ -50,7 +65,35 @@ from werkzeug.utils import secure_filename
 # ============================================================================
 # APP INITIALIZATION
 # ============================================================================
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson; jsonify() bodies are encoded in one C pass.
+
+    Datetimes are passed through to Flask's default() so they keep the HTTP-date
+    format, and sort_keys is honoured like the stock provider.
+    """
+
+    def _options(self):
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return option
+
+    def dumpb(self, obj):
+        """Encode obj straight to UTF-8 JSON bytes, as sent in a response body"""
+        return orjson.dumps(obj, default=self.default, option=self._options())
+
+    def dumps(self, obj, **kwargs):
+        return self.dumpb(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumpb(obj), mimetype=self.mimetype)
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 
 # ============================================================================
 # CONFIGURATION
@@ -63,15 +106,29 @@ DB_PORT = os.getenv('DB_PORT', '5432')
 DB_NAME = os.getenv('DB_NAME', 'postgres')
 DB_USER = os.getenv('DB_USER', 'postgres')
 DB_PASSWORD = os.getenv('DB_PASSWORD', 'postgres')
+# Sized per gunicorn worker: one connection per worker thread (see Procfile)
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', '2'))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', '8'))
 
 # Ollama Configuration
 OLLAMA_HOST = os.getenv('OLLAMA_HOST', 'http://localhost:11434')
 OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', 'mistral')
 OLLAMA_TIMEOUT = int(os.getenv('OLLAMA_TIMEOUT', '5'))
 
+# Shared secret for /clear-cache; the endpoint is disabled when unset
+CACHE_ADMIN_TOKEN = os.getenv('CACHE_ADMIN_TOKEN', '')
+
 # Company Configuration
 COMPANY_NAME = "Shakti Legal Compliance India"
 COMPANY_LOGO_PATH = "static/logo.png"
+PDF_SPOOL_MAX_SIZE = 8 * 1024 * 1024  # bytes kept in memory before spilling to disk
+
+# Email (SMTP) Configuration
+EMAIL_USER = os.getenv("EMAIL_USER", "slciaiagent@gmail.com")
+EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD", "")
+EMAIL_TO = os.getenv("EMAIL_TO", "slciaiagent@gmail.com")
+EMAIL_HOST = os.getenv('EMAIL_HOST', 'smtp.gmail.com')
+EMAIL_PORT = int(os.getenv('EMAIL_PORT', 465))  # Default to 465
 
 # Fee Enquiry Configuration
 FEE_ENQUIRY_EMAIL = os.getenv("FEE_ENQUIRY_EMAIL", "slciaiagent@gmail.com")
@@ -84,77 +141,177 @@ GOOGLE_SHEET_ENABLED = os.getenv('GOOGLE_SHEET_ENABLED', 'true').lower() == 'tru
 # ============================================================================
 # TIMEZONE HELPER (IST - Indian Standard Time)
 # ============================================================================
+IST = timezone(timedelta(hours=5, minutes=30))
+
 def get_ist_now():
     """Returns current datetime in IST (UTC+5:30) as naive datetime for DB storage"""
-    ist = timezone(timedelta(hours=5, minutes=30))
-    return datetime.now(ist).replace(tzinfo=None)
+    return datetime.now(IST).replace(tzinfo=None)
+
+_ist_stamp = (0, "")  # (epoch second, formatted) - swapped as one tuple so readers never see a torn pair
+
+def get_ist_now_str():
+    """Current IST time as 'YYYY-MM-DD HH:MM:SS'; strftime runs at most once per second"""
+    global _ist_stamp
+    now = int(time.time())
+    second, formatted = _ist_stamp
+    if second != now:
+        formatted = datetime.fromtimestamp(now, IST).strftime('%Y-%m-%d %H:%M:%S')
+        _ist_stamp = (now, formatted)
+    return formatted
 
 # ============================================================================
 # DATABASE CONNECTION POOL - FIXED & COMPLETE
 # ============================================================================
 db_pool = None  # Module level variable
+db_pool_lock = Lock()  # Serializes pool creation across gthread request threads
+db_ready = Event()  # Set once the background startup init_db() has finished
+DB_READY_TIMEOUT = 30
 
 def get_db_pool():
     """Get database connection pool - FIXED for Render"""
     global db_pool
+    # Request threads wait for startup init so tables exist before first query
+    if not db_ready.is_set() and current_thread().name != STARTUP_THREAD_NAME:
+        db_ready.wait(DB_READY_TIMEOUT)
     if db_pool is None:
-        try:
-            # Try DATABASE_URL first
-            database_url = os.getenv('DATABASE_URL')
+        # Only one thread builds the pool; the rest wait and reuse it
+        with db_pool_lock:
+            if db_pool is None:
+                try:
+                    # Try DATABASE_URL first
+                    database_url = os.getenv('DATABASE_URL')
             
-            if database_url:
-                # Fix postgres:// vs postgresql://
-                if database_url.startswith('postgres://'):
-                    database_url = database_url.replace('postgres://', 'postgresql://', 1)
+                    if database_url:
+                        # Fix postgres:// vs postgresql://
+                        if database_url.startswith('postgres://'):
+                            database_url = database_url.replace('postgres://', 'postgresql://', 1)
                 
-                # Ensure sslmode is set
-                if 'sslmode' not in database_url:
-                    separator = '&' if '?' in database_url else '?'
-                    database_url += f"{separator}sslmode=require"
-            else:
-                # Build from individual params
-                database_url = (
-                    f"postgresql://{DB_USER}:{DB_PASSWORD}@"
-                    f"{DB_HOST}:{DB_PORT}/{DB_NAME}"
-                    f"?sslmode=require"
-                )
-            
-            print(f"🔌 Connecting to: {database_url[:50]}...")
+                        # Ensure sslmode is set
+                        if 'sslmode' not in database_url:
+                            separator = '&' if '?' in database_url else '?'
+                            database_url += f"{separator}sslmode=require"
+                    else:
+                        # Build from individual params
+                        database_url = (
+                            f"postgresql://{DB_USER}:{DB_PASSWORD}@"
+                            f"{DB_HOST}:{DB_PORT}/{DB_NAME}"
+                            f"?sslmode=require"
+                        )
             
-            # Create pool with proper settings for Render
-            db_pool = ConnectionPool(
-                conninfo=database_url,
-                min_size=1,
-                max_size=5,
-                open=True,
-                timeout=30,
-                max_waiting=3,
-                max_lifetime=600,
-                kwargs={
-                    'sslmode': 'require',
-                    'sslrootcert': None
-                }
-            )
+                    print(f"🔌 Connecting to: {database_url[:50]}...")
             
-            # Test immediately
-            with db_pool.connection() as conn:
-                with conn.cursor() as cur:
-                    cur.execute("SELECT 1")
-                    print("✅ Database connection successful!")
+                    # Create pool with proper settings for Render. It is only published to
+                    # db_pool once it works: a pool whose wait() timed out is closed by
+                    # psycopg_pool and would fail every later query with PoolClosed.
+                    pool = ConnectionPool(
+                        conninfo=database_url,
+                        min_size=DB_POOL_MIN,
+                        max_size=DB_POOL_MAX,
+                        open=True,
+                        timeout=10,
+                        max_idle=300,
+                        max_lifetime=1800,
+                        num_workers=2,
+                        kwargs={
+                            'sslmode': 'require',
+                            'sslrootcert': None
+                        }
+                    )
+                    try:
+                        # Pre-open min_size connections so the first requests don't pay the connect
+                        pool.wait(timeout=10)
+                
+                        # Test immediately
+                        with pool.connection() as conn:
+                            with conn.cursor() as cur:
+                                cur.execute("SELECT 1")
+                                print("✅ Database connection successful!")
+                    except Exception:
+                        pool.close()  # db_pool stays None so the next call retries
+                        raise
             
-            return db_pool
+                    db_pool = pool
+                    return db_pool
             
-        except Exception as e:
-            print(f"❌ Database pool creation failed: {e}")
-            import traceback
-            traceback.print_exc()
-            return None
+                except Exception as e:
+                    print(f"❌ Database pool creation failed: {e}")
+                    traceback.print_exc()
+                    return None
     
     return db_pool
 
 # ============================================================================
 # DATABASE INITIALIZATION
 # ============================================================================
+INIT_DB_SQL = """
+    -- Create downloads table
+    CREATE TABLE IF NOT EXISTS downloads (
+        id SERIAL PRIMARY KEY,
+        full_name TEXT NOT NULL,
+        company_name TEXT NOT NULL,
+        email TEXT NOT NULL,
+        contact_number TEXT NOT NULL,
+        designation TEXT NOT NULL,
+        rating INTEGER NOT NULL,
+        state TEXT NOT NULL,
+        act_type TEXT NOT NULL,
+        ip_address TEXT,
+        user_agent TEXT,
+        download_date TIMESTAMP,
+        pdf_generated BOOLEAN DEFAULT FALSE,
+        pdf_path TEXT
+    );
+
+    -- Create service enquiries table
+    CREATE TABLE IF NOT EXISTS service_enquiries (
+        id SERIAL PRIMARY KEY,
+        enquiry_id TEXT UNIQUE NOT NULL,
+        full_name TEXT NOT NULL,
+        company_name TEXT NOT NULL,
+        email TEXT NOT NULL,
+        contact_number TEXT NOT NULL,
+        service TEXT NOT NULL,
+        query TEXT NOT NULL,
+        ip_address TEXT,
+        status TEXT DEFAULT 'pending',
+        submission_date TIMESTAMP,
+        email_sent BOOLEAN DEFAULT TRUE,
+        notes TEXT
+    );
+
+    -- Create fee enquiries table
+    CREATE TABLE IF NOT EXISTS fee_enquiries (
+        id SERIAL PRIMARY KEY,
+        enquiry_id TEXT UNIQUE NOT NULL,
+        full_name TEXT NOT NULL,
+        company_name TEXT NOT NULL,
+        email TEXT NOT NULL,
+        contact_number TEXT NOT NULL,
+        description TEXT NOT NULL,
+        ip_address TEXT,
+        status TEXT DEFAULT 'pending',
+        submission_date TIMESTAMP,
+        email_sent BOOLEAN DEFAULT TRUE,
+        notes TEXT
+    );
+
+    -- Create download stats table
+    CREATE TABLE IF NOT EXISTS download_stats (
+        id SERIAL PRIMARY KEY,
+        state TEXT NOT NULL,
+        act_type TEXT NOT NULL,
+        download_count INTEGER DEFAULT 0,
+        last_download TIMESTAMP,
+        UNIQUE(state, act_type)
+    );
+
+    -- Create indexes
+    CREATE INDEX IF NOT EXISTS idx_downloads_email ON downloads(email);
+    CREATE INDEX IF NOT EXISTS idx_downloads_date ON downloads(download_date);
+    CREATE INDEX IF NOT EXISTS idx_enquiries_email ON service_enquiries(email);
+    CREATE INDEX IF NOT EXISTS idx_fee_enquiries_email ON fee_enquiries(email);
+"""
+
 def init_db():
     """Create all tables if they don't exist - UPDATED: Removed DEFAULT CURRENT_TIMESTAMP"""
     try:
@@ -167,80 +324,8 @@ def init_db():
         
         with pool.connection() as conn:
             with conn.cursor() as cur:
-                # Create downloads table
-                cur.execute("""
-                    CREATE TABLE IF NOT EXISTS downloads (
-                        id SERIAL PRIMARY KEY,
-                        full_name TEXT NOT NULL,
-                        company_name TEXT NOT NULL,
-                        email TEXT NOT NULL,
-                        contact_number TEXT NOT NULL,
-                        designation TEXT NOT NULL,
-                        rating INTEGER NOT NULL,
-                        state TEXT NOT NULL,
-                        act_type TEXT NOT NULL,
-                        ip_address TEXT,
-                        user_agent TEXT,
-                        download_date TIMESTAMP,
-                        pdf_generated BOOLEAN DEFAULT FALSE,
-                        pdf_path TEXT
-                    )
-                """)
-                
-                # Create service enquiries table
-                cur.execute("""
-                    CREATE TABLE IF NOT EXISTS service_enquiries (
-                        id SERIAL PRIMARY KEY,
-                        enquiry_id TEXT UNIQUE NOT NULL,
-                        full_name TEXT NOT NULL,
-                        company_name TEXT NOT NULL,
-                        email TEXT NOT NULL,
-                        contact_number TEXT NOT NULL,
-                        service TEXT NOT NULL,
-                        query TEXT NOT NULL,
-                        ip_address TEXT,
-                        status TEXT DEFAULT 'pending',
-                        submission_date TIMESTAMP,
-                        email_sent BOOLEAN DEFAULT TRUE,
-                        notes TEXT
-                    )
-                """)
-                
-                # Create fee enquiries table
-                cur.execute("""
-                    CREATE TABLE IF NOT EXISTS fee_enquiries (
-                        id SERIAL PRIMARY KEY,
-                        enquiry_id TEXT UNIQUE NOT NULL,
-                        full_name TEXT NOT NULL,
-                        company_name TEXT NOT NULL,
-                        email TEXT NOT NULL,
-                        contact_number TEXT NOT NULL,
-                        description TEXT NOT NULL,
-                        ip_address TEXT,
-                        status TEXT DEFAULT 'pending',
-                        submission_date TIMESTAMP,
-                        email_sent BOOLEAN DEFAULT TRUE,
-                        notes TEXT
-                    )
-                """)
-                
-                # Create download stats table
-                cur.execute("""
-                    CREATE TABLE IF NOT EXISTS download_stats (
-                        id SERIAL PRIMARY KEY,
-                        state TEXT NOT NULL,
-                        act_type TEXT NOT NULL,
-                        download_count INTEGER DEFAULT 0,
-                        last_download TIMESTAMP,
-                        UNIQUE(state, act_type)
-                    )
-                """)
-                
-                # Create indexes
-                cur.execute("CREATE INDEX IF NOT EXISTS idx_downloads_email ON downloads(email)")
-                cur.execute("CREATE INDEX IF NOT EXISTS idx_downloads_date ON downloads(download_date)")
-                cur.execute("CREATE INDEX IF NOT EXISTS idx_enquiries_email ON service_enquiries(email)")
-                cur.execute("CREATE INDEX IF NOT EXISTS idx_fee_enquiries_email ON fee_enquiries(email)")
+                # All DDL in one multi-statement execute: one round-trip on cold start
+                cur.execute(INIT_DB_SQL)
                 
                 conn.commit()
                 
@@ -258,39 +343,121 @@ def init_db():
         
     except Exception as e:
         print(f"❌ Database initialization error: {e}")
-        import traceback
         traceback.print_exc()
         return False
 
-# ============================================================================
-# DEPRECATED CONNECTION FUNCTIONS (for backward compatibility)
-# ============================================================================
-def get_db_connection():
-    """DEPRECATED: Use pool.connection() context manager instead"""
-    global db_pool
+# Enquiry inserts are group-committed by _enquiry_writer: rows queued while a
+# commit is in flight share the next transaction. Items are
+# (table, params, done Event, status) where status["state"] moves from
+# "queued" to "writing" (or "cancelled") under enquiry_lock, and
+# status["committed"] holds the outcome once done is set.
+ENQUIRY_INSERT_SQL = {
+    "service_enquiries": """
+        INSERT INTO service_enquiries
+        (enquiry_id, full_name, company_name, email, contact_number,
+         service, query, ip_address, status, submission_date)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """,
+    "fee_enquiries": """
+        INSERT INTO fee_enquiries
+        (enquiry_id, full_name, company_name, email, contact_number,
+         description, ip_address, status, submission_date)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """,
+}
+ENQUIRY_BATCH_MAX = 50
+ENQUIRY_WRITE_TIMEOUT = 30  # seconds a handler waits before giving up on a queued row
+enquiry_queue = Queue()
+enquiry_lock = Lock()
+
+def save_enquiry(table, params):
+    """Queue an enquiry row and wait until it is committed; returns success"""
+    done, status = Event(), {"state": "queued", "committed": False}
+    enquiry_queue.put((table, params, done, status))
+    if not done.wait(ENQUIRY_WRITE_TIMEOUT):
+        with enquiry_lock:
+            if status["state"] == "queued":
+                # Never written: cancel it so a late commit can't contradict our error
+                status["state"] = "cancelled"
+                print(f"❌ Timed out waiting for {table} insert: {params[0]}")
+                return False
+        # Already being written: its outcome is only moments away
+        done.wait()
+    return status["committed"]
+
+def _insert_enquiries(batch):
+    """Insert queued enquiries in one transaction and wake their handlers"""
+    rows_by_table = {}
+    for table, params, _, _ in batch:
+        rows_by_table.setdefault(table, []).append(params)
+
+    ok = False
     try:
         pool = get_db_pool()
         if pool:
-            return pool.getconn()
-        return None
+            with pool.connection() as conn:
+                with conn.cursor() as cur:
+                    for table, rows in rows_by_table.items():
+                        cur.executemany(ENQUIRY_INSERT_SQL[table], rows)
+                conn.commit()
+            ok = True
+        else:
+            print("⚠️ No database pool available")
+    except (psycopg.DataError, psycopg.IntegrityError) as e:
+        # A bad row must not fail its neighbours: retry the batch row by row
+        print(f"❌ Database insert error: {e}")
+        if len(batch) > 1:
+            for item in batch:
+                _insert_enquiries([item])
+            return
     except Exception as e:
-        print(f"❌ Connection error: {e}")
-        return None
+        # Connection/pool failures would hit every row alike: fail the batch at once
+        print(f"❌ Database insert error: {e}")
+        traceback.print_exc()
 
-def release_db_connection(conn):
-    """DEPRECATED: Use pool.connection() context manager instead"""
-    global db_pool
-    if conn and db_pool:
-        try:
-            db_pool.putconn(conn)
-        except Exception as e:
-            print(f"⚠️ Error releasing connection: {e}")
+    for _, params, done, status in batch:
+        status["committed"] = ok
+        if ok:
+            print(f"✅ Database insert successful: {params[0]} at {params[-1]} IST")
+        done.set()
+
+def _enquiry_writer():
+    """Drain enquiry_queue, committing everything queued so far together"""
+    while True:
+        batch = [enquiry_queue.get()]
+        while len(batch) < ENQUIRY_BATCH_MAX:
+            try:
+                batch.append(enquiry_queue.get_nowait())
+            except Empty:
+                break
+        # Claim the rows; ones whose handler already gave up are dropped
+        with enquiry_lock:
+            batch = [item for item in batch if item[3]["state"] == "queued"]
+            for item in batch:
+                item[3]["state"] = "writing"
+        if batch:
+            _insert_enquiries(batch)
 
 # ============================================================================
 # GOOGLE SHEETS CONNECTION
 # ============================================================================
 gs_client = None
 gs_lock = Lock()
+sheet_queue = Queue()  # (sheet_name, normalized row) pairs for _sheet_worker
+SHEET_BATCH_MAX = 50
+SHEET_BATCH_WAIT = 0.5
+SHEET_BACKOFF_MAX = 60  # seconds
+sheet_header_cache = {}  # worksheet.id -> normalized header keys
+
+GOOGLE_SCOPES = (
+    'https://www.googleapis.com/auth/spreadsheets',
+    'https://www.googleapis.com/auth/drive.file'
+)
+
+@lru_cache(maxsize=1)
+def get_google_credentials():
+    """Service-account credentials, parsed once per process (google-auth refreshes the token itself)"""
+    return Credentials.from_service_account_file(GOOGLE_CREDENTIALS_PATH, scopes=list(GOOGLE_SCOPES))
 
 def get_google_sheet_client():
     """Get Google Sheets client - Fixed for production use"""
@@ -311,11 +478,7 @@ def get_google_sheet_client():
                 print(f"❌ Cannot read credentials file: {e}")
                 return None
             
-            scopes = [
-                'https://www.googleapis.com/auth/spreadsheets',
-                'https://www.googleapis.com/auth/drive.file'
-            ]
-            creds = Credentials.from_service_account_file(GOOGLE_CREDENTIALS_PATH, scopes=scopes)
+            creds = get_google_credentials()
             gs_client = gspread.authorize(creds)
             
             try:
@@ -333,13 +496,11 @@ def get_google_sheet_client():
                 return None
             except Exception as e:
                 print(f"❌ Google Sheets init error: {type(e).__name__}: {str(e)}")
-                import traceback
                 traceback.print_exc()
                 gs_client = None
                 return None
         except Exception as e:
             print(f"❌ Google Sheets init error: {type(e).__name__}: {str(e)}")
-            import traceback
             traceback.print_exc()
             gs_client = None
             return None
@@ -356,11 +517,45 @@ def _get_sheet_headers(sheet_name):
     }
     return headers_map.get(sheet_name, ["Timestamp"])
 
+def _get_cached_headers(worksheet, sheet_name):
+    """Return the worksheet's normalized header keys, reading row 1 only once per worksheet"""
+    with gs_lock:
+        header_keys = sheet_header_cache.get(worksheet.id)
+    if header_keys is None:
+        headers = worksheet.row_values(1)
+        if not headers:
+            headers = _get_sheet_headers(sheet_name)
+            worksheet.append_row(headers, value_input_option='USER_ENTERED')
+            print(f"✅ Added headers to {sheet_name}")
+        header_keys = tuple(h.lower().replace(' ', '_') for h in headers)
+        with gs_lock:
+            sheet_header_cache[worksheet.id] = header_keys
+    return header_keys
+
+def _sheet_cell(value):
+    """Format one value as a sheet cell string"""
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    return str(value).strip()
+
 def append_to_google_sheet(sheet_name, data_row):
-    """Append data row to Google Sheet - Production ready with retry logic"""
+    """Queue a data row for the Google Sheets writer thread"""
     if not GOOGLE_SHEET_ENABLED:
         return False
     
+    normalized_data = {}
+    for key, value in data_row.items():
+        normalized_key = key.lower().replace(' ', '_')
+        normalized_data[normalized_key] = value if value is not None else ''
+    
+    if 'timestamp' not in normalized_data:
+        normalized_data['timestamp'] = get_ist_now_str()
+    
+    sheet_queue.put((sheet_name, normalized_data))
+    return True
+
+def _write_sheet_rows(sheet_name, data_rows):
+    """Append normalized data rows to a Google Sheet in one call - with retry logic"""
     try:
         client = get_google_sheet_client()
         if not client:
@@ -379,54 +574,54 @@ def append_to_google_sheet(sheet_name, data_row):
             worksheet = spreadsheet.add_worksheet(title=sheet_name, rows=2000, cols=30)
             print(f"✅ Created new worksheet: {sheet_name}")
         
-        headers = _get_sheet_headers(sheet_name)
-        if headers and not worksheet.row_values(1):
-            worksheet.append_row(headers, value_input_option='USER_ENTERED')
-            print(f"✅ Added headers to {sheet_name}")
+        header_keys = _get_cached_headers(worksheet, sheet_name)
+        rows = [[_sheet_cell(data.get(key, '')) for key in header_keys] for data in data_rows]
         
-        normalized_data = {}
-        for key, value in data_row.items():
-            normalized_key = key.lower().replace(' ', '_')
-            normalized_data[normalized_key] = value if value is not None else ''
-        
-        if 'timestamp' not in normalized_data:
-            normalized_data['timestamp'] = get_ist_now().strftime('%Y-%m-%d %H:%M:%S')
-        
-        sheet_headers = [h.lower().replace(' ', '_') for h in worksheet.row_values(1)]
-        row_values = []
-        for header in sheet_headers:
-            value = normalized_data.get(header, '')
-            if isinstance(value, (dict, list)):
-                value = json.dumps(value)
-            row_values.append(str(value).strip())
-        
-        with gs_lock:
-            for attempt in range(3):
-                try:
-                    worksheet.append_row(row_values, value_input_option='USER_ENTERED')
-                    print(f"✅ Data logged to Google Sheet: {sheet_name}")
-                    return True
-                except gspread.exceptions.APIError as e:
-                    if "Quota exceeded" in str(e) or "Rate limit" in str(e):
-                        wait_time = 2 ** attempt
-                        print(f"⚠️ Rate limited. Waiting {wait_time}s before retry {attempt+1}/3...")
-                        time.sleep(wait_time)
-                        continue
+        # Only the append itself holds gs_lock; backoff sleeps happen outside it
+        for attempt in range(3):
+            try:
+                with gs_lock:
+                    worksheet.append_rows(rows, value_input_option='USER_ENTERED')
+                print(f"✅ {len(rows)} row(s) logged to Google Sheet: {sheet_name}")
+                return True
+            except gspread.exceptions.APIError as e:
+                if "Quota exceeded" in str(e) or "Rate limit" in str(e):
+                    # Jitter spreads out retries from workers that hit the limit together
+                    wait_time = min(SHEET_BACKOFF_MAX, 2 ** attempt + random.random())
+                    print(f"⚠️ Rate limited. Waiting {wait_time:.1f}s before retry {attempt+1}/3...")
+                    time.sleep(wait_time)
+                    continue
+                raise
+            except Exception as e:
+                print(f"⚠️ Append attempt {attempt+1} failed: {e}")
+                if attempt == 2:
                     raise
-                except Exception as e:
-                    print(f"⚠️ Append attempt {attempt+1} failed: {e}")
-                    if attempt == 2:
-                        raise
-                    time.sleep(1)
+                time.sleep(1)
         
-        return True
+        print(f"❌ Still rate limited - dropped {len(rows)} row(s) for {sheet_name}")
+        return False
         
     except Exception as e:
         print(f"❌ Google Sheets append error: {type(e).__name__}: {str(e)}")
-        import traceback
         traceback.print_exc()
         return False
 
+def _sheet_worker():
+    """Drain sheet_queue, coalescing queued rows into one append per sheet"""
+    while True:
+        batch = [sheet_queue.get()]
+        while len(batch) < SHEET_BATCH_MAX:
+            try:
+                batch.append(sheet_queue.get(timeout=SHEET_BATCH_WAIT))
+            except Empty:
+                break
+        
+        rows_by_sheet = {}
+        for sheet_name, normalized_data in batch:
+            rows_by_sheet.setdefault(sheet_name, []).append(normalized_data)
+        for sheet_name, data_rows in rows_by_sheet.items():
+            _write_sheet_rows(sheet_name, data_rows)
+
 
 @app.route("/debug-sheets", methods=["GET"])
 def debug_sheets():
@@ -458,9 +653,7 @@ def debug_sheets():
         result["errors"].append(f"Credentials file not found: {GOOGLE_CREDENTIALS_PATH}")
     if result["credentials_valid"]:
         try:
-            scopes = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive.file']
-            creds = Credentials.from_service_account_file(GOOGLE_CREDENTIALS_PATH, scopes=scopes)
-            client = gspread.authorize(creds)
+            client = gspread.authorize(get_google_credentials())
             result["client_initialized"] = True
             try:
                 spreadsheet = client.open_by_key(GOOGLE_SHEET_ID)
@@ -495,7 +688,8 @@ def log_download_request(data, ip_address, user_agent):
         
         # Use context manager instead of manual connection management
         with pool.connection() as conn:
-            with conn.cursor() as cur:
+            # Pipeline mode sends both statements in a single round-trip
+            with conn.cursor() as cur, conn.pipeline():
                 cur.execute("""
                     INSERT INTO downloads 
                     (full_name, company_name, email, contact_number, designation, rating, state, act_type, ip_address, user_agent)
@@ -513,10 +707,9 @@ def log_download_request(data, ip_address, user_agent):
                     ip_address, 
                     user_agent
                 ))
-                download_id = cur.fetchone()[0]
                 
-                # Update stats
-                cur.execute("""
+                # Update stats (own cursor so the INSERT's RETURNING row stays readable)
+                conn.execute("""
                     INSERT INTO download_stats (state, act_type, download_count, last_download)
                     VALUES (%s, %s, 1, CURRENT_TIMESTAMP)
                     ON CONFLICT(state, act_type) DO UPDATE 
@@ -524,100 +717,98 @@ def log_download_request(data, ip_address, user_agent):
                         last_download = CURRENT_TIMESTAMP
                 """, (data['state'], data['actType']))
                 
+                download_id = cur.fetchone()[0]
+                
                 conn.commit()
                 print(f"✅ Download logged: ID {download_id}")
                 return download_id
                 
     except Exception as e:
         print(f"❌ Download logging error: {e}")
-        import traceback
         traceback.print_exc()
         return None
     
 def get_download_statistics():
     """Get download statistics - psycopg 3.x compatible"""
-    conn = None
     try:
-        conn = get_db_connection()
-        if not conn:
+        pool = get_db_pool()
+        if not pool:
             return {'total': 0, 'today': 0}
-        with conn.cursor() as cursor:
+        with pool.connection() as conn, conn.cursor() as cursor:
             cursor.execute('SELECT COUNT(*) as total FROM downloads')
             total = cursor.fetchone()[0]
-            cursor.execute('SELECT COUNT(*) as count FROM downloads WHERE DATE(download_date) = CURRENT_DATE')
+            # Range predicate (not DATE(download_date)) so idx_downloads_date is usable
+            cursor.execute('SELECT COUNT(*) as count FROM downloads WHERE download_date >= CURRENT_DATE AND download_date < CURRENT_DATE + 1')
             today = cursor.fetchone()[0]
         return {'total': total, 'today': today}
     except Exception as e:
         print(f"Statistics error: {str(e)}")
         return {'total': 0, 'today': 0}
-    finally:
-        if conn:
-            release_db_connection(conn)
 
 # ============================================================================
 # CONNECTION & STATE DETECTION
 # ============================================================================
+# Keep-alive session for Ollama calls; reuses TCP connections across requests
+ollama_session = requests.Session()
+ollama_session.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=16))
+ollama_session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=16))
+OLLAMA_STATUS_TTL = 5  # seconds a liveness probe result is reused
+
+@cached(TTLCache(maxsize=1, ttl=OLLAMA_STATUS_TTL), lock=Lock())
 def check_ollama_connection():
     try:
-        response = requests.get(f"{OLLAMA_HOST}/api/tags", timeout=2)
+        response = ollama_session.get(f"{OLLAMA_HOST}/api/tags", timeout=2)
         return response.status_code == 200
     except:
         return False
 
+STATE_PATTERNS = tuple(re.compile(p) for p in (
+    r'(?:of|for|in)\s+([a-zA-Z\s]+?)(?:\?|$|\.)',
+    r'([a-zA-Z\s]+?)\s+(?:state|act|rules|law)',
+    r'what is .*? (?:act|rules|law) (?:of|for|in) ([a-zA-Z\s]+)',
+))
+
 def detect_state(message, act_type="minimum_wages"):
     """Improved state detection with better matching for all act types"""
-    message_lower = message.lower()
-    state_patterns = [r'(?:of|for|in)\s+([a-zA-Z\s]+?)(?:\?|$|\.)', r'([a-zA-Z\s]+?)\s+(?:state|act|rules|law)', r'what is .*? (?:act|rules|law) (?:of|for|in) ([a-zA-Z\s]+)']
+    return _detect_state_cached(message.lower(), act_type)
+
+@lru_cache(maxsize=4096)
+def _detect_state_cached(message_lower, act_type):
+    """detect_state() body, memoized on (lowercased message, act_type)"""
     extracted_state = None
-    for pattern in state_patterns:
-        match = re.search(pattern, message_lower)
+    for pattern in STATE_PATTERNS:
+        match = pattern.search(message_lower)
         if match:
             extracted_state = match.group(1).strip()
             break
+    # Fast path: extracted phrase is exactly a known state/alias - single dict hit
+    alias_state = STATE_ALIAS_INDEX.get(extracted_state) if extracted_state else None
     if act_type == "minimum_wages":
-        url_dict = STATE_MINIMUM_WAGE_URLS
-        for state in url_dict.keys():
-            if state in message_lower:
-                return state, STATE_MINIMUM_WAGE_URLS[state]
-        for state, variations in STATE_VARIATIONS.items():
-            for variation in variations:
-                if variation in message_lower or (extracted_state and variation in extracted_state):
-                    return state, STATE_MINIMUM_WAGE_URLS.get(state, STATE_MINIMUM_WAGE_URLS.get(state.lower()))
+        if alias_state in STATE_MINIMUM_WAGE_URLS:
+            return alias_state, STATE_MINIMUM_WAGE_URLS[alias_state]
     elif act_type == "holiday_list":
-        for state, url in STATE_HOLIDAY_URLS.items():
-            if state in message_lower or (extracted_state and state in extracted_state):
-                return state, url
-            for variation in STATE_VARIATIONS.get(state, []):
-                if variation in message_lower:
-                    return state, url
+        if alias_state in STATE_HOLIDAY_URLS:
+            return alias_state, STATE_HOLIDAY_URLS[alias_state]
     elif act_type == "working_hours":
-        for state, url in STATE_WORKING_HOURS_URLS.items():
-            if state in message_lower or (extracted_state and state in extracted_state):
-                return state, url
-            for variation in STATE_VARIATIONS.get(state, []):
-                if variation in message_lower:
-                    return state, url
+        if alias_state in STATE_WORKING_HOURS_URLS:
+            return alias_state, STATE_WORKING_HOURS_URLS[alias_state]
     elif act_type == "shop_establishment":
-        for state in STATE_VARIATIONS.keys():
-            if state in message_lower:
-                return state, SHOP_ESTABLISHMENT_MAIN_URL
-        for state, variations in STATE_VARIATIONS.items():
-            for variation in variations:
-                if variation in message_lower:
-                    return state, SHOP_ESTABLISHMENT_MAIN_URL
-        if extracted_state:
-            for state in STATE_VARIATIONS.keys():
-                if state in extracted_state.lower():
-                    return state, SHOP_ESTABLISHMENT_MAIN_URL
-                for variation in STATE_VARIATIONS[state]:
-                    if variation in extracted_state.lower():
-                        return state, SHOP_ESTABLISHMENT_MAIN_URL
+        if alias_state:
+            return alias_state, SHOP_ESTABLISHMENT_MAIN_URL
+    matcher = STATE_MATCHERS.get(act_type)
+    if matcher:
+        return matcher.first(message_lower, extracted_state)
     return None, None
 
 # ============================================================================
 # TEMPORARY STORAGE FOR PENDING DOWNLOADS
 # ============================================================================
-pending_downloads = {}
+# Tokens expire after PENDING_DOWNLOAD_TTL seconds; abandoned ones are evicted
+# automatically and the total is capped. TTLCache itself is not thread-safe,
+# so access still goes through pending_lock.
+PENDING_DOWNLOAD_TTL = 600
+PENDING_DOWNLOADS_MAX = 10_000
+pending_downloads = TTLCache(maxsize=PENDING_DOWNLOADS_MAX, ttl=PENDING_DOWNLOAD_TTL)
 pending_lock = Lock()
 
 # ============================================================================
@@ -633,15 +824,11 @@ def generate_pdf(token):
     """Step 2: Generate and serve PDF using validated token"""
     try:
         with pending_lock:
-            if token not in pending_downloads:
-                return jsonify({"error": "Invalid or expired download token"}), 404
-            pending_data = pending_downloads[token]
-            if (datetime.now() - pending_data['created_at']).total_seconds() > 600:
-                del pending_downloads[token]
-                return jsonify({"error": "Download token expired"}), 410
-            form_data = pending_data['data']
-            download_id = pending_data['download_id']
-            del pending_downloads[token]
+            pending_data = pending_downloads.pop(token, None)
+        if pending_data is None:
+            return jsonify({"error": "Invalid or expired download token"}), 404
+        form_data = pending_data['data']
+        download_id = pending_data['download_id']
         state = form_data['state'].lower().replace('_', ' ')
         act_type = form_data['actType'].lower()
         pdf_data = None
@@ -657,9 +844,9 @@ def generate_pdf(token):
             return jsonify({"error": "Invalid act type"}), 400
         if not pdf_data or not pdf_data.get('tables_data'):
             return jsonify({"error": "No data found to generate PDF"}), 404
-        pdf_file = create_pdf_file(state, pdf_data.get("act_type", act_type), pdf_data.get("tables_data", []), pdf_data.get("effective_date"), download_id)
+        pdf_file, etag, built_at = state_pdf_file(state, act_type, pdf_data, download_id)
         filename = f"{act_type}_{state.replace(' ', '_')}.pdf"
-        return send_file(pdf_file, mimetype='application/pdf', as_attachment=True, download_name=filename)
+        return send_pdf(pdf_file, filename, etag, built_at)
     except Exception as e:
         print(f"PDF Generation Error: {str(e)}")
         return jsonify({"error": str(e)}), 500
@@ -667,17 +854,61 @@ def generate_pdf(token):
 # ============================================================================
 # PDF CREATION FUNCTION
 # ============================================================================
+# Styles never change between PDFs, so the sample sheet and the derived
+# ParagraphStyles are built once at import instead of on every download
+PDF_STYLES = getSampleStyleSheet()
+PDF_TITLE_STYLE = ParagraphStyle('TitleStyle', parent=PDF_STYLES['Heading2'], fontSize=16, alignment=TA_CENTER, spaceAfter=10, textColor=colors.HexColor('#283593'), fontName='Helvetica-Bold')
+PDF_DATE_STYLE = ParagraphStyle('DateStyle', parent=PDF_STYLES['Normal'], fontSize=10, alignment=TA_CENTER, spaceAfter=20, textColor=colors.HexColor('#2e7d32'), fontName='Helvetica-Bold')
+PDF_HEADER_STYLE = ParagraphStyle('HeaderStyle', parent=PDF_STYLES['Normal'], fontSize=9, alignment=TA_CENTER, textColor=colors.white, fontName='Helvetica-Bold')
+PDF_CELL_STYLE = ParagraphStyle('CellStyle', parent=PDF_STYLES['Normal'], fontSize=8, alignment=TA_CENTER, fontName='Helvetica')
+PDF_FOOTER_STYLE = ParagraphStyle('FooterStyle', parent=PDF_STYLES['Normal'], fontSize=8, alignment=TA_CENTER, textColor=colors.grey)
+PDF_COMPANY_STYLE = ParagraphStyle('CompanyHeader', parent=PDF_STYLES['Heading1'], fontSize=18, textColor=colors.HexColor('#1a237e'), spaceAfter=0, leftIndent=10)
+PDF_CELL_PADDING = 4
+# Commands shared by every data table; create_pdf_file only adds zebra stripes
+PDF_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1a237e')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 9),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 8),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#e0e0e0')),
+    ('LEFTPADDING', (0, 0), (-1, -1), PDF_CELL_PADDING),
+    ('RIGHTPADDING', (0, 0), (-1, -1), PDF_CELL_PADDING),
+    ('TOPPADDING', (0, 0), (-1, -1), 4),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+])
+PDF_STRIPE_COLOR = colors.HexColor('#f5f7fa')
+
+# Keep Flate-compressed streams binary: ASCII85 on top inflates every stream
+# (mostly the embedded logo) by ~25% and costs an extra encoding pass
+rl_config.useA85 = 0
+
+# Paragraph markup, entities and whitespace runs/line breaks that a plain
+# table string would render differently from a Paragraph
+_PDF_MARKUP_RE = re.compile(r'[<&\n\r\t]|  ')
+
+def pdf_cell(text, style, max_width):
+    """Plain string for text that fits on one line as-is, Paragraph otherwise"""
+    # Plain strings are drawn directly by the Table (font/size from its
+    # TableStyle) and skip Paragraph's markup parsing and line wrapping
+    if _PDF_MARKUP_RE.search(text) or stringWidth(text, style.fontName, style.fontSize) > max_width:
+        return Paragraph(text, style)
+    return text
+
 def create_pdf_file(state, act_type, tables_data, effective_date, download_id=None):
     """Generate PDF with consistent header, watermark, and footer for ALL act types"""
-    output = io.BytesIO()
-    doc = SimpleDocTemplate(output, pagesize=A4, rightMargin=50, leftMargin=50, topMargin=40, bottomMargin=50)
+    # Small PDFs stay in memory; large ones spill to disk instead of growing RAM
+    output = tempfile.SpooledTemporaryFile(max_size=PDF_SPOOL_MAX_SIZE)
+    doc = SimpleDocTemplate(output, pagesize=A4, rightMargin=50, leftMargin=50, topMargin=40, bottomMargin=50, pageCompression=1)
     elements = []
-    styles = getSampleStyleSheet()
-    build_pdf_header(elements, styles)
-    title_style = ParagraphStyle('TitleStyle', parent=styles['Heading2'], fontSize=16, alignment=TA_CENTER, spaceAfter=10, textColor=colors.HexColor('#283593'), fontName='Helvetica-Bold')
-    date_style = ParagraphStyle('DateStyle', parent=styles['Normal'], fontSize=10, alignment=TA_CENTER, spaceAfter=20, textColor=colors.HexColor('#2e7d32'), fontName='Helvetica-Bold')
-    header_style = ParagraphStyle('HeaderStyle', parent=styles['Normal'], fontSize=9, alignment=TA_CENTER, textColor=colors.white, fontName='Helvetica-Bold')
-    cell_style = ParagraphStyle('CellStyle', parent=styles['Normal'], fontSize=8, alignment=TA_CENTER, fontName='Helvetica')
+    build_pdf_header(elements)
+    title_style = PDF_TITLE_STYLE
+    date_style = PDF_DATE_STYLE
+    header_style = PDF_HEADER_STYLE
+    cell_style = PDF_CELL_STYLE
     display_name = act_type.replace('_', ' ').title()
     elements.append(Paragraph(f"<b>{display_name} – {state.title()}</b>", title_style))
     if effective_date:
@@ -687,6 +918,9 @@ def create_pdf_file(state, act_type, tables_data, effective_date, download_id=No
         for table_data in tables_data:
             if not table_data:
                 continue
+            col_count = len(table_data[0]) if table_data else 0
+            col_widths = [doc.width / col_count] * col_count if col_count else [doc.width]
+            text_width = col_widths[0] - 2 * PDF_CELL_PADDING
             pdf_table_data = []
             for row_idx, row in enumerate(table_data):
                 pdf_row = []
@@ -694,35 +928,20 @@ def create_pdf_file(state, act_type, tables_data, effective_date, download_id=No
                     cell_text = str(cell).strip()
                     if cell_text:
                         if row_idx == 0:
-                            pdf_row.append(Paragraph(cell_text, header_style))
+                            pdf_row.append(pdf_cell(cell_text, header_style, text_width))
                         else:
-                            pdf_row.append(Paragraph(cell_text, cell_style))
+                            pdf_row.append(pdf_cell(cell_text, cell_style, text_width))
                     else:
                         pdf_row.append("")
                 pdf_table_data.append(pdf_row)
-            col_count = len(table_data[0]) if table_data else 0
-            col_widths = [doc.width / col_count] * col_count if col_count else [doc.width]
             pdf_table = Table(pdf_table_data, colWidths=col_widths, repeatRows=1)
-            table_style = TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1a237e')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 9),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#e0e0e0')),
-                ('LEFTPADDING', (0, 0), (-1, -1), 4),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 4),
-                ('TOPPADDING', (0, 0), (-1, -1), 4),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-            ])
-            for i in range(1, len(table_data)):
-                if i % 2 == 0:
-                    table_style.add('BACKGROUND', (0, i), (-1, i), colors.HexColor('#f5f7fa'))
+            table_style = TableStyle(parent=PDF_TABLE_STYLE)
+            for i in range(2, len(table_data), 2):
+                table_style.add('BACKGROUND', (0, i), (-1, i), PDF_STRIPE_COLOR)
             pdf_table.setStyle(table_style)
             elements.append(pdf_table)
             elements.append(Spacer(1, 15))
-    footer_style = ParagraphStyle('FooterStyle', parent=styles['Normal'], fontSize=8, alignment=TA_CENTER, textColor=colors.grey)
+    footer_style = PDF_FOOTER_STYLE
     elements.append(Spacer(1, 20))
     elements.append(Paragraph(f"Generated on {datetime.now().strftime('%d %B %Y | %I:%M %p')}", footer_style))
     elements.append(Paragraph("Shakti Legal Compliance India | www.slci.in", footer_style))
@@ -730,16 +949,111 @@ def create_pdf_file(state, act_type, tables_data, effective_date, download_id=No
     output.seek(0)
     return output
 
+# PDFs built from a scraped page are reused until that page is re-scraped
+PDF_CACHE_TTL = 3600
+pdf_cache = TTLCache(maxsize=128, ttl=PDF_CACHE_TTL)
+pdf_cache_lock = Lock()
+
+def state_pdf_file(state, act_type, data, download_id=None):
+    """(file, etag, built_at) for a fetched state page's PDF, reusing the bytes
+    built from the same fetch result; etag and built_at are None if not cached"""
+    act_type = data.get("act_type", act_type)
+    effective_date = data.get("effective_date")
+    key = (act_type, state, effective_date)
+    with pdf_cache_lock:
+        entry = pdf_cache.get(key)
+    # The cached fetch result is replaced whenever the page is re-scraped, so
+    # identity means the PDF was built from exactly this data
+    if entry is not None and entry[0] is data:
+        _, pdf_bytes, etag, built_at = entry
+        return io.BytesIO(pdf_bytes), etag, built_at
+    pdf_file = create_pdf_file(state, act_type, data.get("tables_data", []), effective_date, download_id)
+    pdf_bytes = pdf_file.read(PDF_SPOOL_MAX_SIZE + 1)
+    if len(pdf_bytes) > PDF_SPOOL_MAX_SIZE:  # too big to keep in memory
+        pdf_file.seek(0)
+        return pdf_file, None, None
+    pdf_file.close()
+    etag = hashlib.sha1(pdf_bytes).hexdigest()
+    built_at = time.time()
+    with pdf_cache_lock:
+        pdf_cache[key] = (data, pdf_bytes, etag, built_at)
+    return io.BytesIO(pdf_bytes), etag, built_at
+
+def send_pdf(pdf_file, filename, etag=None, last_modified=None):
+    """Stream a generated PDF file object to the client as an attachment.
+
+    With an etag, send_file answers If-None-Match/If-Modified-Since with a 304
+    and serves Range requests from the in-memory bytes.
+    """
+    response = send_file(pdf_file, mimetype='application/pdf', as_attachment=True, download_name=filename,
+                         etag=etag if etag is not None else True, last_modified=last_modified)
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 # ============================================================================
 # DATA EXTRACTION HELPERS
 # ============================================================================
-def extract_effective_date(soup):
-    date_patterns = [r'Effective from Date:\s*(\d{1,2}(?:st|nd|rd|th)?\s+[A-Za-z]+,?\s+\d{4})', r'📋 Effective from Date:\s*(\d{1,2}(?:st|nd|rd|th)?\s+[A-Za-z]+,?\s+\d{4})', r'Effective[:\s]+from[:\s]+Date[:\s]*(\d{1,2}(?:st|nd|rd|th)?\s+[A-Za-z]+,?\s+\d{4})', r'w\.e\.f[.\s]*(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})', r'Effective Date[:\s]*(\d{1,2}(?:st|nd|rd|th)?\s+[A-Za-z]+,?\s+\d{4})']
-    all_elements = soup.find_all(['div', 'p', 'span', 'h1', 'h2', 'h3', 'h4', 'li', 'td', 'th'])
-    for element in all_elements:
-        element_text = element.get_text()
-        for pattern in date_patterns:
-            match = re.search(pattern, element_text, re.IGNORECASE)
+# Text nodes that count as visible text: comments and <script>/<style>/<template>
+# contents are skipped, matching what BeautifulSoup's get_text() returned
+_TEXT_NODES = etree.XPath('.//text()[not(ancestor::script or ancestor::style or ancestor::template)]')
+
+def parse_html(content):
+    """Parse fetched page bytes into an lxml element tree"""
+    # slci.in serves UTF-8; without an explicit encoding libxml2 falls back to
+    # Latin-1 whenever the charset <meta> is missing
+    parser = lxml_html.HTMLParser(encoding='utf-8')
+    try:
+        return lxml_html.document_fromstring(content, parser=parser)
+    except etree.ParserError:  # empty document
+        return lxml_html.document_fromstring("<html></html>")
+
+def node_text(element, strip=False):
+    """Visible text of an element; strip=True strips and joins each text node"""
+    strings = _TEXT_NODES(element)
+    if strip:
+        return ''.join(text.strip() for text in strings)
+    return ''.join(strings)
+
+_HAS_HIDDEN_TEXT = etree.XPath('boolean(.//script or .//style or .//template)')
+
+def _plain_text(element):
+    """node_text(element, strip=True) for a subtree with no <script>/<style>/<template>"""
+    if not len(element):
+        return (element.text or '').strip()
+    return ''.join(text.strip() for text in element.itertext())
+
+DATE_PATTERNS = tuple(re.compile(p, re.IGNORECASE) for p in (
+    r'Effective from Date:\s*(\d{1,2}(?:st|nd|rd|th)?\s+[A-Za-z]+,?\s+\d{4})',
+    r'📋 Effective from Date:\s*(\d{1,2}(?:st|nd|rd|th)?\s+[A-Za-z]+,?\s+\d{4})',
+    r'Effective[:\s]+from[:\s]+Date[:\s]*(\d{1,2}(?:st|nd|rd|th)?\s+[A-Za-z]+,?\s+\d{4})',
+    r'w\.e\.f[.\s]*(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
+    r'Effective Date[:\s]*(\d{1,2}(?:st|nd|rd|th)?\s+[A-Za-z]+,?\s+\d{4})',
+))
+# All patterns as one alternation: a single scan rules out elements with no date
+_ANY_DATE_RE = re.compile("|".join(f"(?:{p.pattern})" for p in DATE_PATTERNS), re.IGNORECASE)
+
+DATE_TEXT_TAGS = frozenset(('div', 'p', 'span', 'h1', 'h2', 'h3', 'h4', 'li', 'td', 'th'))
+
+def _outer_date_elements(element):
+    """Outermost DATE_TEXT_TAGS elements under `element`, in document order.
+
+    A nested element's text is a slice of its ancestor's, and ancestors come
+    first in document order, so the first outer element with a match is exactly
+    where a scan over every element would have stopped.
+    """
+    for child in element:
+        if child.tag in DATE_TEXT_TAGS:
+            yield child
+        else:
+            yield from _outer_date_elements(child)
+
+def extract_effective_date(tree):
+    for element in _outer_date_elements(tree):
+        element_text = node_text(element)
+        if not _ANY_DATE_RE.search(element_text):
+            continue
+        for pattern in DATE_PATTERNS:
+            match = pattern.search(element_text)
             if match:
                 return clean_date(match.group(1))
     return None
@@ -759,34 +1073,62 @@ def clean_date(date_str):
             return f"{parts[0]}/{parts[1]}/{parts[2]}"
     return date_str
 
-def extract_table_data(soup):
+def parse_state_page(tree, heading=""):
+    """One walk over every <table>, returning (tables_data, html_output).
+
+    Each cell's text is read once and feeds both the cleaned rows used for PDFs
+    and the chat table markup; `heading` is a format string for the table number.
+    """
     tables_data = []
-    tables = soup.find_all("table")
-    for table in tables:
+    chunks = []
+    for idx, table in enumerate(tree.iter("table"), 1):
+        chunks.append(heading.format(idx))
+        chunks.append('<table class="minimum-wage-table">')
         table_rows = []
-        rows = table.find_all("tr")
-        for row in rows:
-            cols = row.find_all(["td", "th"])
-            if cols:
-                row_data = []
-                for col in cols:
-                    cell_text = col.get_text(strip=True)
-                    cell_text = ' '.join(cell_text.split())
-                    cell_text = cell_text.replace('[dl_btn]', '').strip()
-                    row_data.append(cell_text)
-                table_rows.append(row_data)
+        # itertext() skips comments but not script/style text, so tables that
+        # contain those keep the XPath-filtered node_text
+        cell_text = (lambda col: node_text(col, strip=True)) if _HAS_HIDDEN_TEXT(table) else _plain_text
+        for row in table.iter("tr"):
+            cells = [(col.tag, cell_text(col)) for col in row.iter("td", "th")]
+            chunks.append("<tr>" + "".join([f"<th>{text}</th>" if tag == "th" else f"<td>{text}</td>" for tag, text in cells]) + "</tr>")
+            if cells:
+                table_rows.append([' '.join(text.split()).replace('[dl_btn]', '').strip() for _, text in cells])
+        chunks.append("</table>")
         if table_rows:
             tables_data.append(table_rows)
-    return tables_data
+    return tables_data, "".join(chunks)
+
+def extract_table_data(tree):
+    return parse_state_page(tree)[0]
 
 # ============================================================================
 # PDF WATERMARK & HEADER
 # ============================================================================
+def _load_logo_reader():
+    """Decode the company logo once; every PDF reuses the same ImageReader"""
+    if not os.path.exists(COMPANY_LOGO_PATH):
+        return None
+    try:
+        reader = ImageReader(COMPANY_LOGO_PATH)
+        reader.getRGBData()  # decode now so request threads only read cached pixels
+        return reader
+    except Exception as e:
+        print(f"⚠️ Logo load error: {e}")
+        return None
+
+LOGO_READER = _load_logo_reader()
+
+class SharedImage(Image):
+    """platypus Image backed by an already-decoded ImageReader"""
+    def __init__(self, reader, width=None, height=None):
+        self._img = reader
+        super().__init__(reader.fileName, width=width, height=height)
+
 def add_watermark(canvas, doc):
     canvas.saveState()
     try:
-        if os.path.exists(COMPANY_LOGO_PATH):
-            img = ImageReader(COMPANY_LOGO_PATH)
+        if LOGO_READER:
+            img = LOGO_READER
             page_width, page_height = doc.pagesize
             watermark_width = page_width * 0.65
             watermark_height = watermark_width
@@ -798,15 +1140,14 @@ def add_watermark(canvas, doc):
         print(f"Watermark Error: {e}")
     canvas.restoreState()
 
-def build_pdf_header(elements, styles):
+def build_pdf_header(elements):
     try:
         header_data = []
-        if os.path.exists(COMPANY_LOGO_PATH):
-            logo = Image(COMPANY_LOGO_PATH, width=50, height=50)
+        if LOGO_READER:
+            logo = SharedImage(LOGO_READER, width=50, height=50)
         else:
-            logo = Paragraph("", styles['Normal'])
-        company_style = ParagraphStyle('CompanyHeader', parent=styles['Heading1'], fontSize=18, textColor=colors.HexColor('#1a237e'), spaceAfter=0, leftIndent=10)
-        company_name = Paragraph(f"<b>{COMPANY_NAME}</b>", company_style)
+            logo = Paragraph("", PDF_STYLES['Normal'])
+        company_name = Paragraph(f"<b>{COMPANY_NAME}</b>", PDF_COMPANY_STYLE)
         header_data.append([logo, company_name])
         table = Table(header_data, colWidths=[60, 400])
         table.setStyle(TableStyle([('VALIGN', (0, 0), (-1, -1), 'MIDDLE'), ('ALIGN', (0, 0), (0, 0), 'LEFT'), ('ALIGN', (1, 0), (1, 0), 'LEFT'), ('LEFTPADDING', (0, 0), (-1, -1), 0), ('BOTTOMPADDING', (0, 0), (-1, -1), 10)]))
@@ -821,33 +1162,89 @@ def build_pdf_header(elements, styles):
 # ============================================================================
 # DATA FETCHING FUNCTIONS
 # ============================================================================
+# Keep-alive session for slci.in scraping; every fetcher hits the same host
+SCRAPE_WORKERS = 16
+scrape_session = requests.Session()
+scrape_session.mount('http://', HTTPAdapter(pool_connections=2, pool_maxsize=SCRAPE_WORKERS))
+scrape_session.mount('https://', HTTPAdapter(pool_connections=2, pool_maxsize=SCRAPE_WORKERS))
+
+def fetch_all(states, fetcher):
+    """Run fetcher over states concurrently, returning {state: result}"""
+    states = list(states)
+    if not states:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(SCRAPE_WORKERS, len(states)), thread_name_prefix="slci-fetch") as executor:
+        return dict(zip(states, executor.map(fetcher, states)))
+
+# Scraped pages change daily at most; results are kept per (fetcher, state)
+# and re-scraped in the background before they expire
+SCRAPE_CACHE_TTL = 3600
+SCRAPE_REFRESH_INTERVAL = 3000  # must stay below SCRAPE_CACHE_TTL
+scrape_cache = TTLCache(maxsize=512, ttl=SCRAPE_CACHE_TTL)
+scrape_cache_lock = Lock()
+scrape_fetchers = {}  # fetcher name -> uncached fetcher, for the refresher
+scrape_refreshers = {}  # fetcher name -> fn(states) -> {state: result}, where fetch_all won't do
+scrape_accessed = set()  # scrape_cache keys read since the last refresh cycle
+
+def _store_scrape_result(name, state, result):
+    # Only successful scrapes are kept; failures and empty pages retry next time
+    if result and result.get("tables_data"):
+        with scrape_cache_lock:
+            scrape_cache[(name, state)] = result
+
+def scrape_cached(fetcher):
+    """Serve fetcher(state) from scrape_cache while the entry is fresh"""
+    name = fetcher.__name__
+    scrape_fetchers[name] = fetcher
+
+    @wraps(fetcher)
+    def wrapper(state):
+        with scrape_cache_lock:
+            scrape_accessed.add((name, state))
+            result = scrape_cache.get((name, state))
+        if result is None:
+            result = fetcher(state)
+            _store_scrape_result(name, state, result)
+        return result
+    return wrapper
+
+def _scrape_refresher():
+    """Re-scrape cached pages read since the last cycle ahead of their TTL.
+
+    Pages nobody asked for in a whole cycle are left to expire, so a worker
+    doesn't keep scraping everything it has ever served.
+    """
+    global scrape_accessed
+    while True:
+        time.sleep(SCRAPE_REFRESH_INTERVAL)
+        with scrape_cache_lock:
+            keys = [key for key in scrape_accessed if key in scrape_cache]
+            scrape_accessed = set()
+        by_fetcher = {}
+        for name, state in keys:
+            by_fetcher.setdefault(name, []).append(state)
+        for name, states in by_fetcher.items():
+            try:
+                refresh = scrape_refreshers.get(name)
+                results = refresh(states) if refresh else fetch_all(states, scrape_fetchers[name])
+                for state, result in results.items():
+                    _store_scrape_result(name, state, result)
+                print(f"🔄 Refreshed {len(states)} recently read page(s) for {name}")
+            except Exception as e:
+                print(f"⚠️ Scrape cache refresh failed for {name}: {e}")
+
+@scrape_cached
 def fetch_minimum_wages(state):
     try:
         url = STATE_MINIMUM_WAGE_URLS.get(state)
         if not url:
             return None
         headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-        response = requests.get(url, timeout=10, headers=headers)
-        soup = BeautifulSoup(response.text, "html.parser")
-        effective_date = extract_effective_date(soup)
-        tables_data = extract_table_data(soup)
-        html_output = ""
-        tables = soup.find_all("table")
-        if tables:
-            for idx, table in enumerate(tables, 1):
-                rows = table.find_all("tr")
-                html_output += f"<h4 style='margin:15px 0 10px;'>Table {idx}</h4>"
-                html_output += '<table class="minimum-wage-table">'
-                for row in rows:
-                    cols = row.find_all(["td", "th"])
-                    html_output += "<tr>"
-                    for col in cols:
-                        text = col.get_text(strip=True)
-                        tag = "th" if col.name == "th" else "td"
-                        html_output += f"<{tag}>{text}</{tag}>"
-                    html_output += "</tr>"
-                html_output += "</table>"
-        else:
+        response = scrape_session.get(url, timeout=10, headers=headers)
+        tree = parse_html(response.content)
+        effective_date = extract_effective_date(tree)
+        tables_data, html_output = parse_state_page(tree, "<h4 style='margin:15px 0 10px;'>Table {}</h4>")
+        if not html_output:
             html_output = "<p>No wage data table found.</p>"
         date_header = f'<div class="effective-date-banner"><div class="date-content"><i class="fas fa-calendar-check"></i><span class="date-label">EFFECTIVE DATE:</span><span class="date-value">{effective_date or "Check on website"}</span></div></div>' if effective_date else '<div class="effective-date-banner warning"><div class="date-content"><i class="fas fa-exclamation-triangle"></i><span class="date-label">EFFECTIVE DATE:</span><span class="date-value">Check on website</span></div></div>'
         state_url_encoded = state.replace(' ', '_')
@@ -858,32 +1255,17 @@ def fetch_minimum_wages(state):
         print(f"Error fetching wages for {state}: {str(e)}")
         return {"html": f"<p>Error fetching wages data for {state.title()}.</p>", "effective_date": None, "tables_data": []}
 
+@scrape_cached
 def fetch_holiday_list(state):
     try:
         url = STATE_HOLIDAY_URLS.get(state)
         if not url:
             return None
         headers = {'User-Agent': 'Mozilla/5.0'}
-        response = requests.get(url, timeout=10, headers=headers)
-        soup = BeautifulSoup(response.text, "html.parser")
-        tables_data = extract_table_data(soup)
-        tables = soup.find_all("table")
-        html_output = ""
-        if tables:
-            for idx, table in enumerate(tables, 1):
-                rows = table.find_all("tr")
-                html_output += f"<h4>Holiday Table {idx}</h4>"
-                html_output += '<table class="minimum-wage-table">'
-                for row in rows:
-                    cols = row.find_all(["td", "th"])
-                    html_output += "<tr>"
-                    for col in cols:
-                        text = col.get_text(strip=True)
-                        tag = "th" if col.name == "th" else "td"
-                        html_output += f"<{tag}>{text}</{tag}>"
-                    html_output += "</tr>"
-                html_output += "</table>"
-        else:
+        response = scrape_session.get(url, timeout=10, headers=headers)
+        tree = parse_html(response.content)
+        tables_data, html_output = parse_state_page(tree, "<h4>Holiday Table {}</h4>")
+        if not html_output:
             html_output = "<p>No holiday table found.</p>"
         download_state = state.replace(" ", "_")
         download_button = f'<div style="text-align:right; margin:15px 0;"><button onclick="openDownloadModal(\'{download_state}\', \'holiday_list\')" class="download-pdf-btn"><i class="fas fa-file-pdf"></i> Download Holiday List PDF</button></div>'
@@ -937,40 +1319,24 @@ def test_db_connection():
                     "host": DB_HOST
                 })
     except Exception as e:
-        import traceback
         return jsonify({
             "status": "error",
             "message": str(e),
             "traceback": traceback.format_exc()
         }), 500
 
+@scrape_cached
 def fetch_working_hours(state):
     try:
         url = STATE_WORKING_HOURS_URLS.get(state)
         if not url:
             return None
         headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-        response = requests.get(url, timeout=10, headers=headers)
-        soup = BeautifulSoup(response.text, "html.parser")
-        effective_date = extract_effective_date(soup)
-        tables_data = extract_table_data(soup)
-        tables = soup.find_all("table")
-        html_output = ""
-        if tables:
-            for idx, table in enumerate(tables, 1):
-                rows = table.find_all("tr")
-                html_output += f"<h4>Working Hours – Table {idx}</h4>"
-                html_output += '<table class="minimum-wage-table">'
-                for row in rows:
-                    cols = row.find_all(["td", "th"])
-                    html_output += "<tr>"
-                    for col in cols:
-                        text = col.get_text(strip=True)
-                        tag = "th" if col.name == "th" else "td"
-                        html_output += f"<{tag}>{text}</{tag}>"
-                    html_output += "</tr>"
-                html_output += "</table>"
-        else:
+        response = scrape_session.get(url, timeout=10, headers=headers)
+        tree = parse_html(response.content)
+        effective_date = extract_effective_date(tree)
+        tables_data, html_output = parse_state_page(tree, "<h4>Working Hours – Table {}</h4>")
+        if not html_output:
             html_output = "<p>No working hours table found.</p>"
         state_encoded = state.replace(" ", "_")
         download_button = f'<div style="text-align:right; margin:15px 0;"><button onclick="openDownloadModal(\'{state_encoded}\', \'working_hours\')" class="download-pdf-btn"><i class="fas fa-file-pdf"></i> Download Working Hours PDF</button></div>'
@@ -981,28 +1347,52 @@ def fetch_working_hours(state):
         print(f"Working Hours Fetch Error: {e}")
         return None
 
-def fetch_shop_establishment(state):
+@lru_cache(maxsize=256)
+def state_row_pattern(state_lower):
+    """Single regex matching a table row that mentions any variation of a state.
+
+    Multi-word variations match as plain substrings; single words match as a
+    whole \\w+ token, or space-delimited (e.g. "j&k"), or as the entire row.
+    """
+    alternatives = []
+    for variation in STATE_VARIATIONS.get(state_lower, (state_lower,)):
+        literal = re.escape(variation)
+        if ' ' in variation:
+            alternatives.append(literal)
+        elif re.fullmatch(r'\w+', variation):
+            alternatives.append(rf'(?<!\w){literal}(?!\w)')
+        else:
+            alternatives.append(rf'(?:\A|(?<= )){literal}(?= |\Z)|\A\s*{literal}\s*\Z')
+    return re.compile('|'.join(alternatives))
+
+def fetch_shop_establishment_tables():
+    """Download the shared Shop & Establishment page and extract its tables"""
+    headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
+    response = scrape_session.get(SHOP_ESTABLISHMENT_MAIN_URL, timeout=10, headers=headers)
+    return extract_table_data(parse_html(response.content))
+
+@scrape_cached
+def fetch_shop_establishment(state, tables_data=None):
     """Fetch and filter Shop and Establishment Act data for specific state - FIXED"""
     try:
         url = SHOP_ESTABLISHMENT_MAIN_URL
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-        response = requests.get(url, timeout=10, headers=headers)
-        soup = BeautifulSoup(response.text, "html.parser")
-        tables_data = extract_table_data(soup)
+        if tables_data is None:
+            tables_data = fetch_shop_establishment_tables()
         html_output = ""
         
         if state is None or state.lower() == "all_states":
-            html_output = "<h4>Select a State:</h4><ul style='columns:2; list-style-type:none; padding:0;'>"
+            parts = ["<h4>Select a State:</h4><ul style='columns:2; list-style-type:none; padding:0;'>"]
             for s in sorted(STATE_VARIATIONS.keys()):
-                html_output += f"<li style='padding:8px; margin:5px; background:#f5f5f5; border-radius:5px;'>📍 {s.title()}</li>"
-            html_output += "</ul>"
+                parts.append(f"<li style='padding:8px; margin:5px; background:#f5f5f5; border-radius:5px;'>📍 {s.title()}</li>")
+            parts.append("</ul>")
+            html_output = "".join(parts)
             return {"html": html_output, "tables_data": [], "state": "All States", "act_type": "Shop_and_Establishment", "effective_date": None}
         
         filtered_tables = []
         state_lower = state.lower().strip()
         
-        # Create exact match patterns for each state
-        exact_state_variations = STATE_VARIATIONS.get(state_lower, [state_lower])
+        # One compiled pattern covers every variation of the state
+        row_pattern = state_row_pattern(state_lower)
         
         if tables_data:
             for table in tables_data:
@@ -1015,28 +1405,9 @@ def fetch_shop_establishment(state):
                         continue
                     
                     row_text = ' '.join(str(cell).lower() for cell in row)
-                    
-                    # FIX: Use exact matching instead of substring matching
-                    row_words = set(re.findall(r'\b\w+\b', row_text))
-                    
-                    for variation in exact_state_variations:
-                        variation_lower = variation.lower()
-                        
-                        # Check if variation exists as a whole word
-                        if (variation_lower in row_words or 
-                            f" {variation_lower} " in f" {row_text} " or
-                            variation_lower == row_text.strip()):
-                            state_found = True
-                            filtered_rows.append(row)
-                            break
-                        
-                        # Handle multi-word variations
-                        if ' ' in variation_lower:
-                            # For multi-word, check if all words appear in order
-                            if variation_lower in row_text:
-                                state_found = True
-                                filtered_rows.append(row)
-                                break
+                    if row_pattern.search(row_text):
+                        state_found = True
+                        filtered_rows.append(row)
                 
                 if state_found and len(filtered_rows) > 1:
                     filtered_tables.append(filtered_rows)
@@ -1048,19 +1419,21 @@ def fetch_shop_establishment(state):
                 Please check our main page for more details.</p>
             </div>"""
         else:
+            parts = []
             for idx, table_rows in enumerate(filtered_tables, 1):
-                html_output += f"<h4 style='color:#1a237e; margin:20px 0 10px;'>Shop & Establishment Act – {state.title()}</h4>"
-                html_output += '<table class="minimum-wage-table" style="width:100%; border-collapse:collapse;">'
+                parts.append(f"<h4 style='color:#1a237e; margin:20px 0 10px;'>Shop & Establishment Act – {state.title()}</h4>")
+                parts.append('<table class="minimum-wage-table" style="width:100%; border-collapse:collapse;">')
                 for row_idx, row in enumerate(table_rows):
-                    html_output += "<tr>"
+                    parts.append("<tr>")
                     for col in row:
                         cell_text = str(col).strip()
                         tag = "th" if row_idx == 0 else "td"
                         bg_color = "#1a237e" if row_idx == 0 else "transparent"
                         text_color = "white" if row_idx == 0 else "#333"
-                        html_output += f"<{tag} style='border:1px solid #ddd; padding:8px; background-color:{bg_color}; color:{text_color}; text-align:left;'>{cell_text}</{tag}>"
-                    html_output += "</tr>"
-                html_output += "</table>"
+                        parts.append(f"<{tag} style='border:1px solid #ddd; padding:8px; background-color:{bg_color}; color:{text_color}; text-align:left;'>{cell_text}</{tag}>")
+                    parts.append("</tr>")
+                parts.append("</table>")
+            html_output = "".join(parts)
         
         state_encoded = state.replace(" ", "_")
         download_button = f'''<div style="text-align:right; margin:20px 0;">
@@ -1090,17 +1463,65 @@ def fetch_shop_establishment(state):
             <p style="color: #721c24; margin-top: 10px;">Error fetching Shop & Establishment data for {state.title()}.<br>
             Please try again later.</p>
         </div>""", "tables_data": [], "state": state, "act_type": "Shop_and_Establishment", "effective_date": None}
-    
+
+def _refresh_shop_establishment(states):
+    """Rebuild every state's Shop & Establishment result from one page download"""
+    tables_data = fetch_shop_establishment_tables()
+    fetcher = scrape_fetchers["fetch_shop_establishment"]
+    return {state: fetcher(state, tables_data) for state in states}
+
+scrape_refreshers["fetch_shop_establishment"] = _refresh_shop_establishment
+
+# Streamed quick answers stop at the first sentence end past this many chars;
+# the whole stream must finish within OLLAMA_FAST_TIMEOUT like the old blocking call
+OLLAMA_FAST_TIMEOUT = 5
+OLLAMA_FAST_MIN_CHARS = 40
+SENTENCE_ENDINGS = ('.', '!', '?')
+
+# Answers to repeated questions are served from memory; keyed on the
+# lowercased, whitespace-collapsed query
+FAST_RESPONSE_CACHE_TTL = 24 * 3600
+fast_response_cache = TTLCache(maxsize=1024, ttl=FAST_RESPONSE_CACHE_TTL)
+fast_response_lock = Lock()
+
 def get_fast_response(query):
+    """Quick Ollama answer for query, reusing earlier answers to the same question"""
+    # The normalized form is only the cache key; the model sees query as given
+    key = ' '.join(query.lower().split())
+    with fast_response_lock:
+        answer = fast_response_cache.get(key)
+    if answer is None:
+        answer = _generate_fast_response(query)
+        if answer:  # failures and empty answers are retried next time
+            with fast_response_lock:
+                fast_response_cache[key] = answer
+    return answer
+
+def _generate_fast_response(query):
     try:
         prompt = f"Question about Indian labor law: {query}\nShort answer:"
-        payload = {"model": OLLAMA_MODEL, "prompt": prompt, "stream": False, "options": {"temperature": 0.3, "max_tokens": 100, "num_predict": 100}}
-        response = requests.post(f"{OLLAMA_HOST}/api/generate", json=payload, timeout=5)
-        if response.status_code == 200:
-            result = response.json()
-            if result and 'response' in result:
-                return result['response'].strip()
-        return None
+        payload = {"model": OLLAMA_MODEL, "prompt": prompt, "stream": True, "options": {"temperature": 0.3, "max_tokens": 100, "num_predict": 100}}
+        deadline = time.monotonic() + OLLAMA_FAST_TIMEOUT
+        parts = []
+        length = 0
+        # Leaving the block closes the connection, which also stops generation
+        with ollama_session.post(f"{OLLAMA_HOST}/api/generate", data=orjson.dumps(payload), headers={'Content-Type': 'application/json'}, stream=True, timeout=OLLAMA_FAST_TIMEOUT) as response:
+            if response.status_code != 200:
+                return None
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = orjson.loads(line)
+                token = chunk.get('response', '')
+                parts.append(token)
+                length += len(token)
+                if chunk.get('done'):
+                    break
+                if length > OLLAMA_FAST_MIN_CHARS and token.rstrip().endswith(SENTENCE_ENDINGS):
+                    break
+                if time.monotonic() > deadline:
+                    return None
+        return ''.join(parts).strip()
     except:
         return None
 
@@ -1113,15 +1534,65 @@ def get_fast_response(query):
 # ============================================================================
 # EMAIL FUNCTIONS - FIXED FOR RENDER (SMTP_SSL Port 465)
 # ============================================================================
-
-def send_service_enquiry_email(data, enquiry_id):
+# Shared CSS for both enquiry emails; only the accent colour differs
+_ENQUIRY_EMAIL_CSS = """body{font-family:'Segoe UI',Tahoma,Geneva,Verdana,sans-serif;line-height:1.6;color:#333;margin:0;padding:0}
+.container{max-width:650px;margin:0 auto;padding:20px}
+.header{background:linear-gradient(135deg,#1a237e 0%,#283593 100%);color:#fff;padding:25px 20px;text-align:center;border-radius:8px 8px 0 0}
+.header h2{margin:0;font-size:22px}
+.content{padding:25px;background:#f9f9f9;border:1px solid #e0e0e0;border-top:none}
+.field{margin:18px 0;padding:12px 15px;background:#fff;border-left:4px solid ACCENT;border-radius:0 4px 4px 0}
+.label{font-weight:600;color:#1a237e;font-size:14px;margin-bottom:4px}
+.value{color:#333;font-size:15px;word-break:break-word}
+.footer{text-align:center;padding:20px;color:#666;font-size:12px;background:#f5f5f5;border-radius:0 0 8px 8px}
+.enquiry-id{background:ACCENT;color:#fff;padding:12px;text-align:center;font-size:16px;font-weight:600;margin:15px 0;border-radius:4px}
+.badge{display:inline-block;background:#4caf50;color:#fff;padding:3px 10px;border-radius:12px;font-size:11px;font-weight:600}
+"""
+SERVICE_EMAIL_CSS = _ENQUIRY_EMAIL_CSS.replace("ACCENT", "#667eea")
+FEE_EMAIL_CSS = _ENQUIRY_EMAIL_CSS.replace("ACCENT", "#ff9800")
+
+# One logged-in SMTP_SSL session per worker, reused across enquiry emails
+smtp_lock = Lock()
+smtp_conn = None
+smtp_conn_key = None
+
+def send_smtp_message(msg, host, port, user, password):
+    """Send msg over the shared SMTP session, reconnecting when it has gone stale"""
+    global smtp_conn, smtp_conn_key
+    key = (host, port, user)
+    with smtp_lock:
+        if smtp_conn is not None:
+            try:
+                alive = smtp_conn_key == key and smtp_conn.noop()[0] == 250
+            except smtplib.SMTPException:  # includes SMTPServerDisconnected
+                alive = False
+            if not alive:
+                smtp_conn.close()
+                smtp_conn = None
+        if smtp_conn is None:
+            server = smtplib.SMTP_SSL(host, port, timeout=30)
+            try:
+                server.login(user, password)
+            except Exception:
+                server.close()
+                raise
+            smtp_conn, smtp_conn_key = server, key
+            print(f"📧 [EMAIL] Opened SMTP session to {host}:{port}")
+        try:
+            smtp_conn.send_message(msg)
+        except Exception:
+            # Unknown session state after a failed send: start fresh next time
+            smtp_conn.close()
+            smtp_conn = None
+            raise
+
+def _send_service_enquiry_email(data, enquiry_id, ist_time=None):
     """Send formatted HTML email for service enquiry - Render fixed (Port 465)"""
     try:
-        sender_email = os.getenv("EMAIL_USER", "slciaiagent@gmail.com")
-        sender_password = os.getenv("EMAIL_PASSWORD", "")
-        receiver_email = os.getenv("EMAIL_TO", "slciaiagent@gmail.com")
-        email_host = os.getenv('EMAIL_HOST', 'smtp.gmail.com')
-        email_port = int(os.getenv('EMAIL_PORT', 465))  # Default to 465
+        sender_email = EMAIL_USER
+        sender_password = EMAIL_PASSWORD
+        receiver_email = EMAIL_TO
+        email_host = EMAIL_HOST
+        email_port = EMAIL_PORT
         
         print(f"📧 [EMAIL] Starting: {sender_email} → {receiver_email} via {email_host}:{email_port}")
         print(f"📧 [EMAIL] Password length: {len(sender_password) if sender_password else 0}")
@@ -1133,22 +1604,11 @@ def send_service_enquiry_email(data, enquiry_id):
         msg = MIMEMultipart('alternative')
         msg['From'] = sender_email
         msg['To'] = receiver_email
+        submitted = (ist_time or get_ist_now()).strftime('%d %b %Y, %I:%M %p IST')
         msg['Subject'] = f"🔧 New Service Enquiry - {data['service']} - ID: {enquiry_id}"
         msg['Reply-To'] = data['email']
         
-        html_body = f"""<!DOCTYPE html><html><head><meta charset="UTF-8"><style>
-body{{font-family:'Segoe UI',Tahoma,Geneva,Verdana,sans-serif;line-height:1.6;color:#333;margin:0;padding:0}}
-.container{{max-width:650px;margin:0 auto;padding:20px}}
-.header{{background:linear-gradient(135deg,#1a237e 0%,#283593 100%);color:#fff;padding:25px 20px;text-align:center;border-radius:8px 8px 0 0}}
-.header h2{{margin:0;font-size:22px}}
-.content{{padding:25px;background:#f9f9f9;border:1px solid #e0e0e0;border-top:none}}
-.field{{margin:18px 0;padding:12px 15px;background:#fff;border-left:4px solid #667eea;border-radius:0 4px 4px 0}}
-.label{{font-weight:600;color:#1a237e;font-size:14px;margin-bottom:4px}}
-.value{{color:#333;font-size:15px;word-break:break-word}}
-.footer{{text-align:center;padding:20px;color:#666;font-size:12px;background:#f5f5f5;border-radius:0 0 8px 8px}}
-.enquiry-id{{background:#667eea;color:#fff;padding:12px;text-align:center;font-size:16px;font-weight:600;margin:15px 0;border-radius:4px}}
-.badge{{display:inline-block;background:#4caf50;color:#fff;padding:3px 10px;border-radius:12px;font-size:11px;font-weight:600}}
-</style></head><body><div class="container">
+        html_body = f"""<!DOCTYPE html><html><head><meta charset="UTF-8"><style>{SERVICE_EMAIL_CSS}</style></head><body><div class="container">
 <div class="header"><h2>📋 New Service Enquiry Received</h2><span class="badge">SLCI Chatbot</span></div>
 <div class="enquiry-id">🆔 Enquiry ID: {enquiry_id}</div>
 <div class="content">
@@ -1158,7 +1618,7 @@ body{{font-family:'Segoe UI',Tahoma,Geneva,Verdana,sans-serif;line-height:1.6;co
 <div class="field"><div class="label">📞 Phone</div><div class="value"><a href="tel:{data['contactNumber']}" style="color:#667eea">{data['contactNumber']}</a></div></div>
 <div class="field"><div class="label">🔧 Service</div><div class="value"><strong>{data['service']}</strong></div></div>
 <div class="field"><div class="label">❓ Query</div><div class="value" style="white-space:pre-wrap">{data['query']}</div></div>
-<div class="field"><div class="label">📅 Submitted</div><div class="value">{datetime.now().strftime('%d %b %Y, %I:%M %p IST')}</div></div>
+<div class="field"><div class="label">📅 Submitted</div><div class="value">{submitted}</div></div>
 </div>
 <div class="footer"><p><strong>Shakti Legal Compliance India</strong></p><p>📧 contact@slci.in | 📞 +91 9999329153</p><p>🌐 www.slci.in</p></div>
 </div></body></html>"""
@@ -1168,7 +1628,7 @@ Name: {data['fullName']} | Company: {data['companyName']}
 Email: {data['email']} | Phone: {data['contactNumber']}
 Service: {data['service']}
 Query: {data['query']}
-Time: {datetime.now().strftime('%d %b %Y, %I:%M %p IST')}
+Time: {submitted}
 --
 SLCI | www.slci.in"""
         
@@ -1176,10 +1636,7 @@ SLCI | www.slci.in"""
         msg.attach(MIMEText(html_body, 'html', 'utf-8'))
         
         # 🔐 Use SMTP_SSL directly on port 465 (more reliable on Render)
-        server = smtplib.SMTP_SSL(email_host, email_port, timeout=30)
-        server.login(sender_email, sender_password.strip())
-        server.send_message(msg)
-        server.quit()
+        send_smtp_message(msg, email_host, email_port, sender_email, sender_password.strip())
         
         print(f"✅ [EMAIL] SUCCESS: Sent service enquiry {enquiry_id} to {receiver_email}")
         return True
@@ -1194,19 +1651,18 @@ SLCI | www.slci.in"""
         return False
     except Exception as e:
         print(f"❌ [EMAIL] ERROR: {type(e).__name__}: {str(e)}")
-        import traceback
         traceback.print_exc()
         return False
 
 
-def send_fee_enquiry_email(data, enquiry_id):
+def _send_fee_enquiry_email(data, enquiry_id, ist_time=None):
     """Send formatted HTML email for fee enquiry - Render fixed (Port 465)"""
     try:
-        sender_email = os.getenv("EMAIL_USER", "slciaiagent@gmail.com")
-        sender_password = os.getenv("EMAIL_PASSWORD", "")
-        receiver_email = os.getenv("FEE_ENQUIRY_EMAIL", "slciaiagent@gmail.com")
-        email_host = os.getenv('EMAIL_HOST', 'smtp.gmail.com')
-        email_port = int(os.getenv('EMAIL_PORT', 465))
+        sender_email = EMAIL_USER
+        sender_password = EMAIL_PASSWORD
+        receiver_email = FEE_ENQUIRY_EMAIL
+        email_host = EMAIL_HOST
+        email_port = EMAIL_PORT
         
         print(f"💰 [FEE EMAIL] Starting: {sender_email} → {receiver_email} via {email_host}:{email_port}")
         
@@ -1217,22 +1673,11 @@ def send_fee_enquiry_email(data, enquiry_id):
         msg = MIMEMultipart('alternative')
         msg['From'] = sender_email
         msg['To'] = receiver_email
+        submitted = (ist_time or get_ist_now()).strftime('%d %b %Y, %I:%M %p IST')
         msg['Subject'] = f"💰 New Fee Enquiry - ID: {enquiry_id}"
         msg['Reply-To'] = data['email']
         
-        html_body = f"""<!DOCTYPE html><html><head><meta charset="UTF-8"><style>
-body{{font-family:'Segoe UI',Tahoma,Geneva,Verdana,sans-serif;line-height:1.6;color:#333;margin:0;padding:0}}
-.container{{max-width:650px;margin:0 auto;padding:20px}}
-.header{{background:linear-gradient(135deg,#1a237e 0%,#283593 100%);color:#fff;padding:25px 20px;text-align:center;border-radius:8px 8px 0 0}}
-.header h2{{margin:0;font-size:22px}}
-.content{{padding:25px;background:#f9f9f9;border:1px solid #e0e0e0;border-top:none}}
-.field{{margin:18px 0;padding:12px 15px;background:#fff;border-left:4px solid #ff9800;border-radius:0 4px 4px 0}}
-.label{{font-weight:600;color:#1a237e;font-size:14px;margin-bottom:4px}}
-.value{{color:#333;font-size:15px;word-break:break-word}}
-.footer{{text-align:center;padding:20px;color:#666;font-size:12px;background:#f5f5f5;border-radius:0 0 8px 8px}}
-.enquiry-id{{background:#ff9800;color:#fff;padding:12px;text-align:center;font-size:16px;font-weight:600;margin:15px 0;border-radius:4px}}
-.badge{{display:inline-block;background:#4caf50;color:#fff;padding:3px 10px;border-radius:12px;font-size:11px;font-weight:600}}
-</style></head><body><div class="container">
+        html_body = f"""<!DOCTYPE html><html><head><meta charset="UTF-8"><style>{FEE_EMAIL_CSS}</style></head><body><div class="container">
 <div class="header"><h2>💰 New Fee Enquiry Received</h2><span class="badge">SLCI Pricing</span></div>
 <div class="enquiry-id">🆔 Enquiry ID: {enquiry_id}</div>
 <div class="content">
@@ -1241,7 +1686,7 @@ body{{font-family:'Segoe UI',Tahoma,Geneva,Verdana,sans-serif;line-height:1.6;co
 <div class="field"><div class="label">📧 Email</div><div class="value"><a href="mailto:{data['email']}" style="color:#667eea">{data['email']}</a></div></div>
 <div class="field"><div class="label">📞 Phone</div><div class="value"><a href="tel:{data['contactNumber']}" style="color:#667eea">{data['contactNumber']}</a></div></div>
 <div class="field"><div class="label">📝 Requirements</div><div class="value" style="white-space:pre-wrap">{data['description']}</div></div>
-<div class="field"><div class="label">📅 Submitted</div><div class="value">{datetime.now().strftime('%d %b %Y, %I:%M %p IST')}</div></div>
+<div class="field"><div class="label">📅 Submitted</div><div class="value">{submitted}</div></div>
 </div>
 <div class="footer"><p><strong>Shakti Legal Compliance India</strong></p><p>📧 contact@slci.in | 📞 +91 9999329153</p><p>🌐 www.slci.in</p></div>
 </div></body></html>"""
@@ -1250,7 +1695,7 @@ body{{font-family:'Segoe UI',Tahoma,Geneva,Verdana,sans-serif;line-height:1.6;co
 Name: {data['fullName']} | Company: {data['companyName']}
 Email: {data['email']} | Phone: {data['contactNumber']}
 Requirements: {data['description']}
-Time: {datetime.now().strftime('%d %b %Y, %I:%M %p IST')}
+Time: {submitted}
 --
 SLCI | www.slci.in"""
         
@@ -1258,10 +1703,7 @@ SLCI | www.slci.in"""
         msg.attach(MIMEText(html_body, 'html', 'utf-8'))
         
         # 🔐 Use SMTP_SSL directly on port 465
-        server = smtplib.SMTP_SSL(email_host, email_port, timeout=30)
-        server.login(sender_email, sender_password.strip())
-        server.send_message(msg)
-        server.quit()
+        send_smtp_message(msg, email_host, email_port, sender_email, sender_password.strip())
         
         print(f"✅ [FEE EMAIL] SUCCESS: Sent fee enquiry {enquiry_id} to {receiver_email}")
         return True
@@ -1276,10 +1718,42 @@ SLCI | www.slci.in"""
         return False
     except Exception as e:
         print(f"❌ [FEE EMAIL] ERROR: {type(e).__name__}: {str(e)}")
-        import traceback
         traceback.print_exc()
         return False
 
+# Enquiry emails are sent by a background thread so request handlers never
+# wait on SMTP; items are (kind, data, enquiry_id, ist_time)
+email_queue = Queue()
+EMAIL_SENDERS = {
+    "service": _send_service_enquiry_email,
+    "fee": _send_fee_enquiry_email,
+}
+
+def queue_service_enquiry_email(data, enquiry_id, ist_time=None):
+    """Queue the service enquiry email for the email worker thread.
+
+    email_queue lives in process memory: mails still queued when the worker
+    process exits are lost.
+    """
+    email_queue.put(("service", data, enquiry_id, ist_time))
+
+def queue_fee_enquiry_email(data, enquiry_id, ist_time=None):
+    """Queue the fee enquiry email for the email worker thread.
+
+    email_queue lives in process memory: mails still queued when the worker
+    process exits are lost.
+    """
+    email_queue.put(("fee", data, enquiry_id, ist_time))
+
+def _email_worker():
+    """Drain email_queue one message at a time over the shared SMTP session"""
+    while True:
+        kind, data, enquiry_id, ist_time = email_queue.get()
+        try:
+            EMAIL_SENDERS[kind](data, enquiry_id, ist_time)
+        except Exception as e:
+            print(f"❌ [EMAIL] Worker error for {enquiry_id}: {e}")
+
 # ============================================================================
 # FLASK ROUTES
 # ============================================================================
@@ -1296,28 +1770,44 @@ def test_sheets():
             return jsonify({"status": "failed", "error": "Client not initialized"})
         spreadsheet = client.open_by_key(GOOGLE_SHEET_ID)
         worksheets = spreadsheet.worksheets()
-        test_sheet = spreadsheet.worksheet("Test_Sheet") if any(w.title == "Test_Sheet" for w in worksheets) else spreadsheet.add_worksheet("Test_Sheet", 10, 5)
-        test_sheet.append_row(["Test", datetime.now().strftime('%Y-%m-%d %H:%M:%S'), "Success!"], value_input_option='USER_ENTERED')
+        # Reuse the handle from the listing instead of a second worksheet() lookup
+        test_sheet = next((w for w in worksheets if w.title == "Test_Sheet"), None) or spreadsheet.add_worksheet("Test_Sheet", 10, 5)
+        test_sheet.append_row(["Test", get_ist_now_str(), "Success!"], value_input_option='USER_ENTERED')
         return jsonify({"status": "success", "spreadsheet": spreadsheet.title, "worksheets": [w.title for w in worksheets], "message": "Test row appended successfully"})
     except Exception as e:
         return jsonify({"status": "error", "error": str(e)}), 500
 
-@app.route("/chat", methods=["POST"])
-def chat():
-    user_message = request.json.get("message", "").lower().strip()
-    if not user_message:
-        return jsonify({"response": "Please type a message. How can I help you?"})
-    
+# Encoded JSON bodies of replies to repeated messages, keyed on the
+# lowercased, whitespace-collapsed message
+CHAT_RESPONSE_CACHE_TTL = 1800
+STATE_DATA_TOPICS = frozenset(("shop_establishment", "holiday_list", "working_hours", "minimum_wages"))
+chat_response_cache = TTLCache(maxsize=2048, ttl=CHAT_RESPONSE_CACHE_TTL)
+chat_response_lock = Lock()
+
+# Static reply blocks, rendered once at import
+_STATE_PROMPT_HTML = """<div style="padding:15px; background: #fff3cd; border-left: 4px solid #ffc107; border-radius: 4px;">
+            <h4 style="color:#856404; margin-top:0;">⚠️ Please Specify a State</h4>
+            <p style="color:#856404; margin-bottom:0;">Please mention the state name in your query.</p>
+            <p style="color:#856404; margin-top:10px; margin-bottom:0;">Example: "{example}"</p>
+        </div>"""
+SHOP_ESTAB_PROMPT_HTML = _STATE_PROMPT_HTML.format(example="Shop & Establishment Act of Delhi")
+HOLIDAY_PROMPT_HTML = _STATE_PROMPT_HTML.format(example="Holiday list of Maharashtra")
+WH_PROMPT_HTML = _STATE_PROMPT_HTML.format(example="Working hours of Delhi")
+MW_PROMPT_HTML = _STATE_PROMPT_HTML.format(example="Minimum wages of Delhi")
+FALLBACK_HTML = """<div style="padding: 15px; background: #f8f9fa; border-radius: 8px; border-left: 4px solid #0d6efd;"><p style="margin: 0; color: #333;">Thank you for contacting <strong>Shakti Legal Compliance India</strong>.</p><p style="margin-top: 8px; color: #555;">For detailed assistance regarding your query, please contact our team.</p><div style="margin-top: 10px; color: #444;">📞 <strong>Phone:</strong> +91 9999329153<br>📧 <strong>Email:</strong> contact@slci.in</div></div>"""
+
+def _chat_reply(user_message, topic):
+    """JSON payload for a chat message, or None to fall through to Ollama"""
     # Shop & Establishment queries
-    if "shop and establishment" in user_message or "shop establishment" in user_message or "shop & establishment" in user_message or "sea act" in user_message:
+    if topic == "shop_establishment":
         state, _ = detect_state(user_message, "shop_establishment")
         if state:
             se_data = fetch_shop_establishment(state)
             if se_data and se_data.get("html"):  # Check if data exists
-                return jsonify({"response": se_data["html"], "state": state, "act_type": "shop_establishment"})
+                return {"response": se_data["html"], "state": state, "act_type": "shop_establishment"}
             else:
                 # No data found for the specified state - show spelling/format error
-                return jsonify({"response": f"""<div style="padding:15px; background: #fff3cd; border-left: 4px solid #ffc107; border-radius: 4px;">
+                return {"response": f"""<div style="padding:15px; background: #fff3cd; border-left: 4px solid #ffc107; border-radius: 4px;">
                     <h4 style="color:#856404; margin-top:0;">⚠️ No Data Found</h4>
                     <p style="color:#856404; margin-bottom:0;">We couldn't find Shop & Establishment Act data for "<strong>{state}</strong>".</p>
                     <p style="color:#856404; margin-top:10px; margin-bottom:0;">Please check your spelling or try formatting like:</p>
@@ -1326,29 +1816,25 @@ def chat():
                         <li>"Shop and Establishment Act Maharashtra"</li>
                         <li>"SEA Act Karnataka"</li>
                     </ul>
-                </div>"""})
+                </div>"""}
         
         if "all states" in user_message or "list all" in user_message:
             se_data = fetch_shop_establishment("all_states")
-            return jsonify({"response": se_data["html"], "state": "All States", "act_type": "shop_establishment"})
+            return {"response": se_data["html"], "state": "All States", "act_type": "shop_establishment"}
         
         # If no state detected but query is about shop establishment
-        return jsonify({"response": f"""<div style="padding:15px; background: #fff3cd; border-left: 4px solid #ffc107; border-radius: 4px;">
-            <h4 style="color:#856404; margin-top:0;">⚠️ Please Specify a State</h4>
-            <p style="color:#856404; margin-bottom:0;">Please mention the state name in your query.</p>
-            <p style="color:#856404; margin-top:10px; margin-bottom:0;">Example: "Shop & Establishment Act of Delhi"</p>
-        </div>"""})
+        return {"response": SHOP_ESTAB_PROMPT_HTML}
     
     # Holiday list queries
-    if "holiday" in user_message:
+    if topic == "holiday_list":
         state, url = detect_state(user_message, "holiday_list")
         if state:
             holiday_data = fetch_holiday_list(state)
             if holiday_data and holiday_data.get("html"):  # Check if data exists
-                return jsonify({"response": holiday_data["html"], "state": state, "act_type": "holiday_list"})
+                return {"response": holiday_data["html"], "state": state, "act_type": "holiday_list"}
             else:
                 # No data found for the specified state - show spelling/format error
-                return jsonify({"response": f"""<div style="padding:15px; background: #fff3cd; border-left: 4px solid #ffc107; border-radius: 4px;">
+                return {"response": f"""<div style="padding:15px; background: #fff3cd; border-left: 4px solid #ffc107; border-radius: 4px;">
                     <h4 style="color:#856404; margin-top:0;">⚠️ No Holiday Data Found</h4>
                     <p style="color:#856404; margin-bottom:0;">We couldn't find holiday list for "<strong>{state}</strong>".</p>
                     <p style="color:#856404; margin-top:10px; margin-bottom:0;">Please check your spelling or try formatting like:</p>
@@ -1357,25 +1843,21 @@ def chat():
                         <li>"Holidays in Delhi 2024"</li>
                         <li>"Public holidays Karnataka"</li>
                     </ul>
-                </div>"""})
+                </div>"""}
         
         # If no state detected but query is about holidays
-        return jsonify({"response": f"""<div style="padding:15px; background: #fff3cd; border-left: 4px solid #ffc107; border-radius: 4px;">
-            <h4 style="color:#856404; margin-top:0;">⚠️ Please Specify a State</h4>
-            <p style="color:#856404; margin-bottom:0;">Please mention the state name in your query.</p>
-            <p style="color:#856404; margin-top:10px; margin-bottom:0;">Example: "Holiday list of Maharashtra"</p>
-        </div>"""})
+        return {"response": HOLIDAY_PROMPT_HTML}
     
     # Working hours queries
-    if "working hours" in user_message or "working hour" in user_message:
+    if topic == "working_hours":
         state, url = detect_state(user_message, "working_hours")
         if state:
             wh_data = fetch_working_hours(state)
             if wh_data and wh_data.get("html"):  # Check if data exists
-                return jsonify({"response": wh_data["html"], "state": state, "act_type": "working_hours"})
+                return {"response": wh_data["html"], "state": state, "act_type": "working_hours"}
             else:
                 # No data found for the specified state - show spelling/format error
-                return jsonify({"response": f"""<div style="padding:15px; background: #fff3cd; border-left: 4px solid #ffc107; border-radius: 4px;">
+                return {"response": f"""<div style="padding:15px; background: #fff3cd; border-left: 4px solid #ffc107; border-radius: 4px;">
                     <h4 style="color:#856404; margin-top:0;">⚠️ No Working Hours Data Found</h4>
                     <p style="color:#856404; margin-bottom:0;">We couldn't find working hours information for "<strong>{state}</strong>".</p>
                     <p style="color:#856404; margin-top:10px; margin-bottom:0;">Please check your spelling or try formatting like:</p>
@@ -1384,25 +1866,21 @@ def chat():
                         <li>"Working hours in Maharashtra"</li>
                         <li>"Shop working hours Karnataka"</li>
                     </ul>
-                </div>"""})
+                </div>"""}
         
         # If no state detected but query is about working hours
-        return jsonify({"response": f"""<div style="padding:15px; background: #fff3cd; border-left: 4px solid #ffc107; border-radius: 4px;">
-            <h4 style="color:#856404; margin-top:0;">⚠️ Please Specify a State</h4>
-            <p style="color:#856404; margin-bottom:0;">Please mention the state name in your query.</p>
-            <p style="color:#856404; margin-top:10px; margin-bottom:0;">Example: "Working hours of Delhi"</p>
-        </div>"""})
+        return {"response": WH_PROMPT_HTML}
     
     # Minimum wages queries
-    if "minimum wage" in user_message or "minimum wages" in user_message:
+    if topic == "minimum_wages":
         state, url = detect_state(user_message, "minimum_wages")
         if state:
             wages_data = fetch_minimum_wages(state)
             if wages_data and wages_data.get("html"):  # Check if data exists
-                return jsonify({"response": wages_data["html"], "state": state, "act_type": "minimum_wages"})
+                return {"response": wages_data["html"], "state": state, "act_type": "minimum_wages"}
             else:
                 # No data found for the specified state - show spelling/format error
-                return jsonify({"response": f"""<div style="padding:15px; background: #fff3cd; border-left: 4px solid #ffc107; border-radius: 4px;">
+                return {"response": f"""<div style="padding:15px; background: #fff3cd; border-left: 4px solid #ffc107; border-radius: 4px;">
                     <h4 style="color:#856404; margin-top:0;">⚠️ No Minimum Wages Data Found</h4>
                     <p style="color:#856404; margin-bottom:0;">We couldn't find minimum wages information for "<strong>{state}</strong>".</p>
                     <p style="color:#856404; margin-top:10px; margin-bottom:0;">Please check your spelling or try formatting like:</p>
@@ -1411,30 +1889,14 @@ def chat():
                         <li>"Minimum wage rate Maharashtra"</li>
                         <li>"Minimum wages Karnataka 2024"</li>
                     </ul>
-                </div>"""})
+                </div>"""}
         
         # If no state detected but query is about minimum wages
-        return jsonify({"response": f"""<div style="padding:15px; background: #fff3cd; border-left: 4px solid #ffc107; border-radius: 4px;">
-            <h4 style="color:#856404; margin-top:0;">⚠️ Please Specify a State</h4>
-            <p style="color:#856404; margin-bottom:0;">Please mention the state name in your query.</p>
-            <p style="color:#856404; margin-top:10px; margin-bottom:0;">Example: "Minimum wages of Delhi"</p>
-        </div>"""})
-        # New Labour Codes queries
-        # New Labour Codes queries
-    labour_code_keywords = ["new labour codes", "new labor codes", "labour codes", "labor codes", "new labour laws", 
-                            "new labor laws", "code on social security", "social security code", "industrial relations code", 
-                            "code on wages", "wages code", "occupational safety code", "osh code", "labour code 2020"]
-    
-    if any(phrase in user_message for phrase in labour_code_keywords):
+        return {"response": MW_PROMPT_HTML}
+    # New Labour Codes queries
+    if topic == "new_labour_codes":
         # Check for specific code mentions
-        specific_code = None
-        for code_key, code_data in NEW_LABOUR_CODES.items():
-            for keyword in code_data["keywords"]:
-                if keyword in user_message:
-                    specific_code = code_key
-                    break
-            if specific_code:
-                break
+        specific_code = match_labour_code(user_message)
         
         # If specific code mentioned, show that code details with download button
         if specific_code:
@@ -1487,7 +1949,7 @@ def chat():
                 </div>
             </div>"""
             
-            return jsonify({"response": labour_code_html, "show_labour_codes": True, "specific_code": specific_code})
+            return {"response": labour_code_html, "show_labour_codes": True, "specific_code": specific_code}
         
         # Otherwise show all 4 codes as dropdown options
         else:
@@ -1550,42 +2012,61 @@ def chat():
                 </div>
             </div>"""
             
-            return jsonify({"response": labour_code_overview, "show_labour_codes": True})
+            return {"response": labour_code_overview, "show_labour_codes": True}
     
-    # Rest of your code remains the same...
     # Services list query
-    service_keywords = ["services of slci", "what does slci do", "your services", "services you offer", "list of services", "slci services"]
-    if any(phrase in user_message for phrase in service_keywords):
-        services_html = """<div style="font-family: Arial, sans-serif; padding: 15px; background: linear-gradient(135deg, #f5f7fa 0%, #e9ecef 100%); border-radius: 10px; max-height: 500px; overflow-y: auto;"><h4 style="color: #1a237e; margin-bottom: 15px; display: flex; align-items: center; gap: 8px;"><i class="fas fa-briefcase" style="color: #667eea;"></i> Our Services</h4><div style="display: grid; grid-template-columns: 1fr; gap: 15px;">"""
-        for service in SERVICES_DATA:
-            services_html += f"""<div style="background: white; padding: 15px; border-radius: 8px; border-left: 4px solid #667eea; box-shadow: 0 2px 5px rgba(0,0,0,0.05);"><div style="display: flex; align-items: flex-start; gap: 10px; flex-direction: column;"><h5 style="margin: 0; color: #1a237e; font-size: 16px;">{service['title']}</h5><p style="margin: 5px 0 0; color: #555; font-size: 14px; line-height: 1.5;">{service['description']}</p><button onclick="openServiceModal('{service['title']}')" style="background: #667eea; color: white; border: none; padding: 8px 15px; border-radius: 5px; cursor: pointer; font-size: 13px; transition: all 0.3s; align-self: flex-start; margin-top: 10px;"><i class="fas fa-envelope"></i> Enquire</button></div></div>"""
-        services_html += """</div><p style="margin-top: 15px; color: #666; font-size: 12px; text-align: center;">Click "Enquire" button next to any service to get detailed information</p></div>"""
-        return jsonify({"response": services_html, "show_services": True})
+    if topic == "services":
+        return {"response": SERVICES_HTML, "show_services": True}
     
     # Predefined responses using keywords
-    for key, keywords in KEYWORDS.items():
-        for keyword in keywords:
-            if keyword in user_message:
-                response_text = RESPONSES.get(key, "")
-                if key in ["pricing", "fees", "cost"]:
-                    return jsonify({"response": response_text, "show_fee_button": True})
-                if key in ["epf", "esi"]:
-                    enriched_response = f"""<div style="font-family: Arial, sans-serif;"><p>{response_text}</p><div style="margin-top: 15px; background: #f5f7fa; padding: 15px; border-radius: 8px;"><h4 style="color: #1a237e;">Related Services:</h4><ul style="list-style-type: none; padding: 0;"><li style="margin: 5px 0;">✅ Registration of Employees</li><li style="margin: 5px 0;">✅ Generation of Challans</li><li style="margin: 5px 0;">✅ Monthly Compliance Reports</li></ul></div></div>"""
-                    return jsonify({"response": enriched_response})
-                return jsonify({"response": response_text})
+    key, response_text = resolve_intent(user_message)
+    if key:
+        if key in ["pricing", "fees", "cost"]:
+            return {"response": response_text, "show_fee_button": True}
+        if key in ESI_EPF_REPLIES:
+            return {"response": ESI_EPF_REPLIES[key]}
+        return {"response": response_text}
+    
+    return None
+
+@app.route("/chat", methods=["POST"])
+def chat():
+    raw_message = request.json.get("message", "").lower().strip()
+    # Whitespace runs collapsed too, so spacing variants share cache entries
+    user_message = " ".join(raw_message.split())
+    if not user_message:
+        return jsonify({"response": "Please type a message. How can I help you?"})
+    
+    topic = match_chat_topic(user_message)
+    # State pages are cached and refreshed per page in scrape_cache, and a failed
+    # fetch must not be pinned here; every other reply is static
+    cacheable = topic not in STATE_DATA_TOPICS
+    body = None
+    if cacheable:
+        with chat_response_lock:
+            body = chat_response_cache.get(user_message)
+    if body is None:
+        payload = _chat_reply(user_message, topic)
+        if payload is not None:
+            body = app.json.dumpb(payload)
+            if cacheable:
+                with chat_response_lock:
+                    chat_response_cache[user_message] = body
+    if body is not None:
+        return app.response_class(body, mimetype=app.json.mimetype)
     
     # Try Ollama for unknown queries
     if check_ollama_connection():
-        ollama_response = get_fast_response(user_message)
+        ollama_response = get_fast_response(raw_message)
         if ollama_response:
             return jsonify({"response": ollama_response})
     
     # Fallback response
-    return jsonify({"response": """<div style="padding: 15px; background: #f8f9fa; border-radius: 8px; border-left: 4px solid #0d6efd;"><p style="margin: 0; color: #333;">Thank you for contacting <strong>Shakti Legal Compliance India</strong>.</p><p style="margin-top: 8px; color: #555;">For detailed assistance regarding your query, please contact our team.</p><div style="margin-top: 10px; color: #444;">📞 <strong>Phone:</strong> +91 9999329153<br>📧 <strong>Email:</strong> contact@slci.in</div></div>"""})
+    return jsonify({"response": FALLBACK_HTML})
 def generate_enquiry_id(prefix="ENQ"):
     """Generate a unique enquiry ID"""
     date_part = datetime.now().strftime("%Y%m%d")
-    random_part = secrets.token_hex(3).upper()
+    random_part = os.urandom(3).hex().upper()
     return f"{prefix}-{date_part}-{random_part}"
 
 @app.route("/check-recent-data", methods=["GET"])
@@ -1631,17 +2112,15 @@ def check_recent_data():
 @app.route("/submit-service-enquiry", methods=["POST"])
 def submit_service_enquiry():
     """Handle service enquiry submission - FIXED: Database first, email second, IST Time"""
-    conn = None
     try:
         data = request.json
         print(f"📝 Received service enquiry: {data}")
         
         # Validate required fields
-        required_fields = ['fullName', 'companyName', 'email', 'contactNumber', 'service', 'query']
-        for field in required_fields:
-            if not data.get(field):
-                print(f"❌ Missing field: {field}")
-                return jsonify({"success": False, "error": f"Missing {field}"}), 400
+        field = first_missing_field(data, SERVICE_ENQUIRY_REQUIRED_FIELDS)
+        if field:
+            print(f"❌ Missing field: {field}")
+            return jsonify({"success": False, "error": f"Missing {field}"}), 400
         
         # Validate email
         if not validate_email(data['email']):
@@ -1657,47 +2136,22 @@ def submit_service_enquiry():
         # ========================================================================
         # STEP 1: Insert into database FIRST with IST Time (independent of email)
         # ========================================================================
-        db_success = False
         ist_time = get_ist_now()  # ✅ Get IST Time (UTC+5:30)
-        
-        try:
-            pool = get_db_pool()
-            if pool:
-                with pool.connection() as conn:
-                    with conn.cursor() as cur:
-                        cur.execute("""
-                            INSERT INTO service_enquiries 
-                            (enquiry_id, full_name, company_name, email, contact_number, 
-                             service, query, ip_address, status, submission_date)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        """, (
-                            enquiry_id,
-                            data['fullName'],
-                            data['companyName'],
-                            data['email'],
-                            data['contactNumber'],
-                            data['service'],
-                            data['query'],
-                            request.remote_addr,
-                            'pending',
-                            ist_time  # ✅ IST Time pass kiya
-                        ))
-                        conn.commit()
-                        db_success = True
-                        print(f"✅ Database insert successful: {enquiry_id} at {ist_time} IST")
-            else:
-                print("⚠️ No database pool available")
-        except Exception as e:
-            print(f"❌ Database insert error: {e}")
-            import traceback
-            traceback.print_exc()
-        
-        # STEP 2: Send email (don't fail if email fails) - Updated with IST Time
-        email_sent = False
-        try:
-            email_sent = send_service_enquiry_email(data, enquiry_id, ist_time)  # ✅ Pass IST time to email
-        except Exception as e:
-            print(f"❌ Email error (continuing anyway): {e}")
+        db_success = save_enquiry("service_enquiries", (
+            enquiry_id,
+            data['fullName'],
+            data['companyName'],
+            data['email'],
+            data['contactNumber'],
+            data['service'],
+            data['query'],
+            request.remote_addr,
+            'pending',
+            ist_time
+        ))
+        
+        # STEP 2: Queue email for the background sender - Updated with IST Time
+        queue_service_enquiry_email(data, enquiry_id, ist_time)  # ✅ Pass IST time to email
         
         # STEP 3: Log to Google Sheets - Updated with IST Time
         try:
@@ -1731,7 +2185,6 @@ def submit_service_enquiry():
             
     except Exception as e:
         print(f"❌ Service Enquiry Error: {str(e)}")
-        import traceback
         traceback.print_exc()
         return jsonify({"success": False, "error": str(e)}), 500
     
@@ -1758,8 +2211,8 @@ def download_labour_code(code_key):
                             VALUES (%s, %s, 1, %s)
                             ON CONFLICT(state, act_type) DO UPDATE 
                             SET download_count = download_stats.download_count + 1, 
-                                last_download = %s
-                        """, ("India", f"labour_code_{code_key}", get_ist_now(), get_ist_now()))
+                                last_download = EXCLUDED.last_download
+                        """, ("India", f"labour_code_{code_key}", get_ist_now()))
                         conn.commit()
                         print(f"✅ Labour code download logged: {code_key}")
         except Exception as e:
@@ -1797,8 +2250,8 @@ def download_labour_code_comparison():
                             VALUES (%s, %s, 1, %s)
                             ON CONFLICT(state, act_type) DO UPDATE 
                             SET download_count = download_stats.download_count + 1, 
-                                last_download = %s
-                        """, ("India", "labour_code_comparison", get_ist_now(), get_ist_now()))
+                                last_download = EXCLUDED.last_download
+                        """, ("India", "labour_code_comparison", get_ist_now()))
                         conn.commit()
                         print(f"✅ Labour code comparison download logged")
         except Exception as e:
@@ -1845,7 +2298,7 @@ def download_labour_code_comparison():
                                    "November 2025", download_id)
         
         filename = "labour_codes_comparison.pdf"
-        return send_file(pdf_file, mimetype='application/pdf', as_attachment=True, download_name=filename)
+        return send_pdf(pdf_file, filename)
         
     except Exception as e:
         print(f"Labour Code Comparison Download Error: {str(e)}")
@@ -1887,7 +2340,7 @@ def generate_labour_code_pdf(code_key, download_id=None):
                                code_data['effective_date'], download_id)
     
     filename = f"{code_key.replace('_', '_')}_notification.pdf"
-    return send_file(pdf_file, mimetype='application/pdf', as_attachment=True, download_name=filename)
+    return send_pdf(pdf_file, filename)
 
 @app.route("/submit-fee-enquiry", methods=["POST"])
 def submit_fee_enquiry():
@@ -1897,11 +2350,10 @@ def submit_fee_enquiry():
         print(f"💰 Received fee enquiry: {data}")
         
         # Validate required fields
-        required_fields = ['fullName', 'companyName', 'email', 'contactNumber', 'description']
-        for field in required_fields:
-            if not data.get(field):
-                print(f"❌ Missing field: {field}")
-                return jsonify({"success": False, "error": f"Missing {field}"}), 400
+        field = first_missing_field(data, FEE_ENQUIRY_REQUIRED_FIELDS)
+        if field:
+            print(f"❌ Missing field: {field}")
+            return jsonify({"success": False, "error": f"Missing {field}"}), 400
         
         # Validate email
         if not validate_email(data['email']):
@@ -1917,45 +2369,21 @@ def submit_fee_enquiry():
         # ========================================================================
         # STEP 1: Insert into database FIRST with IST Time
         # ========================================================================
-        db_success = False
         ist_time = get_ist_now()  # ✅ Get IST Time (UTC+5:30)
-        
-        try:
-            pool = get_db_pool()
-            if pool:
-                with pool.connection() as conn:
-                    with conn.cursor() as cur:
-                        cur.execute("""
-                            INSERT INTO fee_enquiries 
-                            (enquiry_id, full_name, company_name, email, contact_number, 
-                             description, ip_address, status, submission_date)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        """, (
-                            enquiry_id,
-                            data['fullName'],
-                            data['companyName'],
-                            data['email'],
-                            data['contactNumber'],
-                            data['description'],
-                            request.remote_addr,
-                            'pending',
-                            ist_time  # ✅ IST Time pass kiya
-                        ))
-                        conn.commit()
-                        db_success = True
-                        print(f"✅ Database insert successful: {enquiry_id} at {ist_time} IST")
-            else:
-                print("⚠️ No database pool available")
-        except Exception as e:
-            print(f"❌ Database insert error: {e}")
-            import traceback
-            traceback.print_exc()
-        
-        # STEP 2: Send email - Updated with IST Time
-        try:
-            send_fee_enquiry_email(data, enquiry_id, ist_time)  # ✅ Pass IST time to email
-        except Exception as e:
-            print(f"❌ Email error (continuing anyway): {e}")
+        db_success = save_enquiry("fee_enquiries", (
+            enquiry_id,
+            data['fullName'],
+            data['companyName'],
+            data['email'],
+            data['contactNumber'],
+            data['description'],
+            request.remote_addr,
+            'pending',
+            ist_time
+        ))
+        
+        # STEP 2: Queue email for the background sender - Updated with IST Time
+        queue_fee_enquiry_email(data, enquiry_id, ist_time)  # ✅ Pass IST time to email
         
         # STEP 3: Log to Google Sheets - Updated with IST Time
         try:
@@ -1988,7 +2416,6 @@ def submit_fee_enquiry():
             
     except Exception as e:
         print(f"❌ Fee Enquiry Error: {str(e)}")
-        import traceback
         traceback.print_exc()
         return jsonify({"success": False, "error": str(e)}), 500
 
@@ -2002,11 +2429,10 @@ def request_download():
         if not data:
             return jsonify({"success": False, "error": "No data provided"}), 400
         
-        required_fields = ['fullName', 'companyName', 'email', 'contactNumber', 'state', 'actType']
-        for field in required_fields:
-            if not data.get(field):
-                print(f"❌ Missing field: {field}")
-                return jsonify({"success": False, "error": f"Missing field: {field}"}), 400
+        field = first_missing_field(data, DOWNLOAD_REQUIRED_FIELDS)
+        if field:
+            print(f"❌ Missing field: {field}")
+            return jsonify({"success": False, "error": f"Missing field: {field}"}), 400
         
         # Set defaults
         if 'designation' not in data:
@@ -2029,12 +2455,23 @@ def request_download():
             if pool:
                 with pool.connection() as conn:
                     with conn.cursor() as cur:
+                        # Download row + stats upsert in one statement / one round-trip;
+                        # the stats row reuses the inserted state, act_type and IST time
                         cur.execute("""
-                            INSERT INTO downloads 
-                            (full_name, company_name, email, contact_number, designation, 
-                             rating, state, act_type, ip_address, user_agent, download_date)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                            RETURNING id
+                            WITH new_download AS (
+                                INSERT INTO downloads 
+                                (full_name, company_name, email, contact_number, designation, 
+                                 rating, state, act_type, ip_address, user_agent, download_date)
+                                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                                RETURNING id, state, act_type, download_date
+                            ), stats AS (
+                                INSERT INTO download_stats (state, act_type, download_count, last_download)
+                                SELECT state, act_type, 1, download_date FROM new_download
+                                ON CONFLICT(state, act_type) DO UPDATE 
+                                SET download_count = download_stats.download_count + 1, 
+                                    last_download = EXCLUDED.last_download
+                            )
+                            SELECT id FROM new_download
                         """, (
                             data['fullName'], 
                             data['companyName'], 
@@ -2050,22 +2487,12 @@ def request_download():
                         ))
                         download_id = cur.fetchone()[0]
                         
-                        # Update stats with IST Time
-                        cur.execute("""
-                            INSERT INTO download_stats (state, act_type, download_count, last_download)
-                            VALUES (%s, %s, 1, %s)
-                            ON CONFLICT(state, act_type) DO UPDATE 
-                            SET download_count = download_stats.download_count + 1, 
-                                last_download = %s
-                        """, (data['state'], data['actType'], ist_time, ist_time))
-                        
                         conn.commit()
                         print(f"✅ Download logged: ID {download_id} at {ist_time} IST")
             else:
                 print("⚠️ No database pool available")
         except Exception as e:
             print(f"❌ Download logging error: {e}")
-            import traceback
             traceback.print_exc()
         
         # Store in pending even if DB failed (for PDF generation)
@@ -2109,7 +2536,6 @@ def request_download():
         
     except Exception as e:
         print(f"❌ Download Request Error: {str(e)}")
-        import traceback
         traceback.print_exc()
         return jsonify({"success": False, "error": str(e)}), 500
 
@@ -2190,51 +2616,39 @@ def download_data(state, act_type):
             holiday_data = fetch_holiday_list(state_key)
             if not holiday_data:
                 return jsonify({"error": "State not found"}), 404
-            pdf_file = create_pdf_file(state_key, holiday_data.get("act_type", act_type), holiday_data.get("tables_data", []), holiday_data.get("effective_date"), download_id)
+            pdf_file, etag, built_at = state_pdf_file(state_key, act_type, holiday_data, download_id)
             filename = f"Holiday_List_{state}.pdf"
-            return send_file(pdf_file, mimetype='application/pdf', as_attachment=True, download_name=filename)
+            return send_pdf(pdf_file, filename, etag, built_at)
         elif act_type == 'minimum_wages':
-            matched_state = None
-            for key in STATE_MINIMUM_WAGE_URLS.keys():
-                if key == state_key or key.replace(' ', '_') == state:
-                    matched_state = key
-                    break
+            matched_state = MINIMUM_WAGE_STATE_LOOKUP.get(state_key) or MINIMUM_WAGE_STATE_LOOKUP.get(state)
             if not matched_state:
                 return jsonify({"error": "State not found"}), 404
             act_data = fetch_minimum_wages(matched_state)
             if not act_data:
                 return jsonify({"error": "No data available"}), 404
-            pdf_file = create_pdf_file(matched_state, act_data.get("act_type", act_type), act_data.get("tables_data", []), act_data.get("effective_date"), download_id)
+            pdf_file, etag, built_at = state_pdf_file(matched_state, act_type, act_data, download_id)
             filename = f"Minimum_Wages_{matched_state.replace(' ', '_')}.pdf"
-            return send_file(pdf_file, mimetype='application/pdf', as_attachment=True, download_name=filename)
+            return send_pdf(pdf_file, filename, etag, built_at)
         elif act_type == 'working_hours':
-            matched_state = None
-            for key in STATE_WORKING_HOURS_URLS.keys():
-                if key == state_key or key.replace(' ', '_') == state:
-                    matched_state = key
-                    break
+            matched_state = WORKING_HOURS_STATE_LOOKUP.get(state_key) or WORKING_HOURS_STATE_LOOKUP.get(state)
             if not matched_state:
                 return jsonify({"error": "State not found"}), 404
             wh_data = fetch_working_hours(matched_state)
             if not wh_data:
                 return jsonify({"error": "No data available"}), 404
-            pdf_file = create_pdf_file(matched_state, wh_data.get("act_type", act_type), wh_data.get("tables_data", []), wh_data.get("effective_date"), download_id)
+            pdf_file, etag, built_at = state_pdf_file(matched_state, act_type, wh_data, download_id)
             filename = f"Working_Hours_{matched_state.replace(' ', '_')}.pdf"
-            return send_file(pdf_file, mimetype='application/pdf', as_attachment=True, download_name=filename)
+            return send_pdf(pdf_file, filename, etag, built_at)
         elif act_type == 'shop_establishment':
-            matched_state = None
-            for key in STATE_VARIATIONS.keys():
-                if key == state_key or key.replace(' ', '_') == state:
-                    matched_state = key
-                    break
+            matched_state = SHOP_ESTABLISHMENT_STATE_LOOKUP.get(state_key) or SHOP_ESTABLISHMENT_STATE_LOOKUP.get(state)
             if not matched_state:
                 matched_state = state_key
             se_data = fetch_shop_establishment(matched_state)
             if not se_data:
                 return jsonify({"error": "No data available"}), 404
-            pdf_file = create_pdf_file(matched_state, se_data.get("act_type", act_type), se_data.get("tables_data", []), se_data.get("effective_date"), download_id)
+            pdf_file, etag, built_at = state_pdf_file(matched_state, act_type, se_data, download_id)
             filename = f"Shop_Establishment_{matched_state.replace(' ', '_')}.pdf"
-            return send_file(pdf_file, mimetype='application/pdf', as_attachment=True, download_name=filename)
+            return send_pdf(pdf_file, filename, etag, built_at)
         else:
             return jsonify({"error": "Invalid act type"}), 404
     except Exception as e:
@@ -2246,15 +2660,14 @@ def submit_enquiry():
     """Handle general enquiry submission"""
     try:
         data = request.json
-        required = ['fullName', 'email', 'contactNumber', 'query']
-        for field in required:
-            if not data.get(field):
-                return jsonify({"success": False, "error": f"Missing {field}"}), 400
+        field = first_missing_field(data, ENQUIRY_REQUIRED_FIELDS)
+        if field:
+            return jsonify({"success": False, "error": f"Missing {field}"}), 400
         if not validate_email(data['email']):
             return jsonify({"success": False, "error": "Invalid email"}), 400
         if not validate_phone(data['contactNumber']):
             return jsonify({"success": False, "error": "Invalid phone"}), 400
-        sheet_data = {'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'full_name': data['fullName'], 'email': data['email'], 'contact_number': data['contactNumber'], 'query': data['query']}
+        sheet_data = {'timestamp': get_ist_now_str(), 'full_name': data['fullName'], 'email': data['email'], 'contact_number': data['contactNumber'], 'query': data['query']}
         append_to_google_sheet("Enquiries", sheet_data)
         return jsonify({"success": True, "message": "Enquiry submitted successfully!"})
     except Exception as e:
@@ -2265,19 +2678,25 @@ def check_ollama_status():
     is_running = check_ollama_connection()
     return jsonify({"status": "connected" if is_running else "disconnected", "model": OLLAMA_MODEL if is_running else None})
 
+@app.route("/clear-cache", methods=["POST"])
+def clear_cache():
+    """Drop cached scraped pages so the next request re-fetches them (this worker only)"""
+    token = request.headers.get('X-Cache-Admin-Token', '')
+    # Compare bytes: compare_digest raises TypeError on non-ASCII str input
+    if not CACHE_ADMIN_TOKEN or not secrets.compare_digest(token.encode(), CACHE_ADMIN_TOKEN.encode()):
+        return jsonify({"error": "Forbidden"}), 403
+    with scrape_cache_lock:
+        cleared = len(scrape_cache)
+        scrape_cache.clear()
+    print(f"🧹 Cleared {cleared} cached page(s)")
+    return jsonify({"status": "cleared", "pages": cleared})
+
 @app.route("/states/<act_type>", methods=["GET"])
 def get_states(act_type):
-    if act_type == 'minimum_wages':
-        states = list(STATE_MINIMUM_WAGE_URLS.keys())
-    elif act_type == 'holiday_list':
-        states = list(STATE_HOLIDAY_URLS.keys())
-    elif act_type == 'working_hours':
-        states = list(STATE_WORKING_HOURS_URLS.keys())
-    elif act_type == 'shop_establishment':
-        states = list(STATE_VARIATIONS.keys())
-    else:
-        states = []
-    return jsonify({"states": states, "act_type": act_type})
+    body = STATES_RESPONSE_BODIES.get(act_type)
+    if body is None:
+        return jsonify({"states": [], "act_type": act_type})
+    return app.response_class(body, mimetype=app.json.mimetype)
 
 @app.route("/health")
 def health():
@@ -2331,6 +2750,8 @@ NEW_LABOUR_CODES = {
         "keywords": ["occupational safety", "safety code", "health and safety", "working conditions", "osh code"]
     }
 }
+# Static content tables are frozen so a handler can't mutate shared state
+NEW_LABOUR_CODES = MappingProxyType({key: MappingProxyType(code) for key, code in NEW_LABOUR_CODES.items()})
 
 # Comparison document data
 LABOUR_CODE_COMPARISON = {
@@ -2347,117 +2768,210 @@ LABOUR_CODE_COMPARISON = {
     ]
 }
 
-STATE_MINIMUM_WAGE_URLS = {
-    "daman and diu": "https://www.slci.in/daman-and-diu/",
-    "arunchal pradesh": "https://www.slci.in/arunachal-pradesh/",
-    "dadra and nagar haveli": "https://www.slci.in/dadra-and-nagar-haveli/",
-    "andaman and nicobar": "https://www.slci.in/andaman-and-nicobar-islands/",
-    "delhi": "https://www.slci.in/minimum-wages/delhi/",
-    "andhra pradesh": "https://www.slci.in/minimum-wages/andhra-pradesh/",
-    "assam": "https://www.slci.in/minimum-wages/assam/",
-    "bihar": "https://www.slci.in/minimum-wages/bihar/",
-    "chandigarh": "https://www.slci.in/minimum-wages/chandigarh/",
-    "chhattisgarh": "https://www.slci.in/minimum-wages/chhattisgarh/",
-    "goa": "https://www.slci.in/minimum-wages/goa/",
-    "gujarat": "https://www.slci.in/minimum-wages/gujarat/",
-    "haryana": "https://www.slci.in/minimum-wages/haryana/",
-    "himachal pradesh": "https://www.slci.in/minimum-wages/himachal-pradesh/",
-    "jammu and kashmir": "https://www.slci.in/minimum-wages/jammu-and-kashmir/",
-    "jharkhand": "https://www.slci.in/minimum-wages/jharkhand/",
-    "karnataka": "https://www.slci.in/minimum-wages/karnataka/",
-    "kerala": "https://www.slci.in/minimum-wages/kerala/",
-    "ladakh": "https://www.slci.in/minimum-wages/ladakh/",
-    "madhya pradesh": "https://www.slci.in/minimum-wages/madhya-pradesh/",
-    "maharashtra": "https://www.slci.in/minimum-wages/maharashtra/",
-    "manipur": "https://www.slci.in/minimum-wages/manipur/",
-    "meghalaya": "https://www.slci.in/minimum-wages/meghalaya/",
-    "mizoram": "https://www.slci.in/minimum-wages/mizoram/",
-    "nagaland": "https://www.slci.in/minimum-wages/nagaland/",
-    "odisha": "https://www.slci.in/minimum-wages/odisha/",
-    "puducherry": "https://www.slci.in/minimum-wages/puducherry/",
-    "punjab": "https://www.slci.in/minimum-wages/punjab/",
-    "rajasthan": "https://www.slci.in/minimum-wages/rajasthan/",
-    "sikkim": "https://www.slci.in/minimum-wages/sikkim/",
-    "tamil nadu": "https://www.slci.in/minimum-wages/tamil-nadu/",
-    "telangana": "https://www.slci.in/minimum-wages/telangana/",
-    "tripura": "https://www.slci.in/minimum-wages/tripura/",
-    "uttar pradesh": "https://www.slci.in/minimum-wages/uttar-pradesh/",
-    "uttarakhand": "https://www.slci.in/minimum-wages/uttarakhand/",
-    "west bengal": "https://www.slci.in/minimum-wages/west-bengal/"
-}
-
-STATE_HOLIDAY_URLS = {
-    "andaman and nicobar": "https://www.slci.in/andaman-and-nicobar-islands-holiday-list/",
-    "andhra pradesh": "https://www.slci.in/andhra-pradesh-holiday-list/",
-    "arunachal pradesh": "https://www.slci.in/arunachal-pradesh-holiday-list/",
-    "assam": "https://www.slci.in/assam-holiday-list/",
-    "bihar": "https://www.slci.in/bihar-holiday-list/",
-    "chandigarh": "https://www.slci.in/chandigarh-holiday-list/",
-    "chhattisgarh": "https://www.slci.in/chhattisgarh-holiday-list/",
-    "daman and diu": "https://www.slci.in/daman-and-diu-holiday-list/",
-    "delhi": "https://www.slci.in/delhi-holiday-list/",
-    "goa": "https://www.slci.in/goa-holiday-list/",
-    "gujarat": "https://www.slci.in/gujarat-holiday-list/",
-    "haryana": "https://www.slci.in/haryana-holiday-list/",
-    "himachal pradesh": "https://www.slci.in/himachal-pradesh-holiday-list/",
-    "jammu and kashmir": "https://www.slci.in/jammu-and-kashmir-holiday-list/",
-    "jharkhand": "https://www.slci.in/jharkhand-holiday-list/",
-    "karnataka": "https://www.slci.in/karnataka-holiday-list/",
-    "kerala": "https://www.slci.in/kerala-holiday-list/",
-    "maharashtra": "https://www.slci.in/maharashtra-holiday-list/",
-    "manipur": "https://www.slci.in/manipur-holiday-list/",
-    "meghalaya": "https://www.slci.in/meghalaya-holiday-list/",
-    "mizoram": "https://www.slci.in/mizoram-holiday-list/",
-    "madhya pradesh": "https://www.slci.in/madhya-pradesh-holiday-list/",
-    "nagaland": "https://www.slci.in/nagaland-holiday-list/",
-    "odisha": "https://www.slci.in/odisha-holiday-list/",
-    "puducherry": "https://www.slci.in/puducherry-holiday-list/",
-    "punjab": "https://www.slci.in/punjab-holiday-list/",
-    "rajasthan": "https://www.slci.in/rajasthan-holiday-list/",
-    "sikkim": "https://www.slci.in/sikkim-holiday-list/",
-    "tamil nadu": "https://www.slci.in/tamil-nadu-holiday-list/",
-    "telangana": "https://www.slci.in/telangana-holiday-list/",
-    "tripura": "https://www.slci.in/tripura-holiday-list/",
-    "uttar pradesh": "https://www.slci.in/uttar-pradesh-holiday-list/",
-    "uttarakhand": "https://www.slci.in/uttarakhand-holiday-list/",
-    "west bengal": "https://www.slci.in/west-bengal-holiday-list/"
+# One row per state holding every act-type URL (wages / holidays / hours).
+# Row order is the holiday-list order; wage and hours keep their own below.
+STATE_URLS = {
+    "andaman and nicobar": {
+        "wages": "https://www.slci.in/andaman-and-nicobar-islands/",
+        "holidays": "https://www.slci.in/andaman-and-nicobar-islands-holiday-list/",
+        "hours": "https://www.slci.in/andaman-and-nicobar-islands-working-hours/"
+    },
+    "andhra pradesh": {
+        "wages": "https://www.slci.in/minimum-wages/andhra-pradesh/",
+        "holidays": "https://www.slci.in/andhra-pradesh-holiday-list/",
+        "hours": "https://www.slci.in/andhra-pradesh-working-hours/"
+    },
+    "arunachal pradesh": {
+        "holidays": "https://www.slci.in/arunachal-pradesh-holiday-list/"
+    },
+    "assam": {
+        "wages": "https://www.slci.in/minimum-wages/assam/",
+        "holidays": "https://www.slci.in/assam-holiday-list/",
+        "hours": "https://www.slci.in/assam-working-hours/"
+    },
+    "bihar": {
+        "wages": "https://www.slci.in/minimum-wages/bihar/",
+        "holidays": "https://www.slci.in/bihar-holiday-list/",
+        "hours": "https://www.slci.in/bihar-working-hours/"
+    },
+    "chandigarh": {
+        "wages": "https://www.slci.in/minimum-wages/chandigarh/",
+        "holidays": "https://www.slci.in/chandigarh-holiday-list/",
+        "hours": "https://www.slci.in/chandigarh-working-hours/"
+    },
+    "chhattisgarh": {
+        "wages": "https://www.slci.in/minimum-wages/chhattisgarh/",
+        "holidays": "https://www.slci.in/chhattisgarh-holiday-list/",
+        "hours": "https://www.slci.in/chhattisgarh-working-hours/"
+    },
+    "daman and diu": {
+        "wages": "https://www.slci.in/daman-and-diu/",
+        "holidays": "https://www.slci.in/daman-and-diu-holiday-list/",
+        "hours": "https://www.slci.in/daman-and-diu-working-hours/"
+    },
+    "delhi": {
+        "wages": "https://www.slci.in/minimum-wages/delhi/",
+        "holidays": "https://www.slci.in/delhi-holiday-list/",
+        "hours": "https://www.slci.in/delhi-working-hours/"
+    },
+    "goa": {
+        "wages": "https://www.slci.in/minimum-wages/goa/",
+        "holidays": "https://www.slci.in/goa-holiday-list/",
+        "hours": "https://www.slci.in/goa-working-hours/"
+    },
+    "gujarat": {
+        "wages": "https://www.slci.in/minimum-wages/gujarat/",
+        "holidays": "https://www.slci.in/gujarat-holiday-list/",
+        "hours": "https://www.slci.in/gujarat-working-hours/"
+    },
+    "haryana": {
+        "wages": "https://www.slci.in/minimum-wages/haryana/",
+        "holidays": "https://www.slci.in/haryana-holiday-list/",
+        "hours": "https://www.slci.in/haryana-working-hours/"
+    },
+    "himachal pradesh": {
+        "wages": "https://www.slci.in/minimum-wages/himachal-pradesh/",
+        "holidays": "https://www.slci.in/himachal-pradesh-holiday-list/",
+        "hours": "https://www.slci.in/himachal-pradesh-working-hours/"
+    },
+    "jammu and kashmir": {
+        "wages": "https://www.slci.in/minimum-wages/jammu-and-kashmir/",
+        "holidays": "https://www.slci.in/jammu-and-kashmir-holiday-list/",
+        "hours": "https://www.slci.in/jammu-and-kashmir-working-hours/"
+    },
+    "jharkhand": {
+        "wages": "https://www.slci.in/minimum-wages/jharkhand/",
+        "holidays": "https://www.slci.in/jharkhand-holiday-list/",
+        "hours": "https://www.slci.in/jharkhand-working-hours/"
+    },
+    "karnataka": {
+        "wages": "https://www.slci.in/minimum-wages/karnataka/",
+        "holidays": "https://www.slci.in/karnataka-holiday-list/",
+        "hours": "https://www.slci.in/karnataka-working-hours/"
+    },
+    "kerala": {
+        "wages": "https://www.slci.in/minimum-wages/kerala/",
+        "holidays": "https://www.slci.in/kerala-holiday-list/",
+        "hours": "https://www.slci.in/kerala-working-hours/"
+    },
+    "maharashtra": {
+        "wages": "https://www.slci.in/minimum-wages/maharashtra/",
+        "holidays": "https://www.slci.in/maharashtra-holiday-list/",
+        "hours": "https://www.slci.in/maharashtra-working-hours/"
+    },
+    "manipur": {
+        "wages": "https://www.slci.in/minimum-wages/manipur/",
+        "holidays": "https://www.slci.in/manipur-holiday-list/",
+        "hours": "https://www.slci.in/manipur-working-hours/"
+    },
+    "meghalaya": {
+        "wages": "https://www.slci.in/minimum-wages/meghalaya/",
+        "holidays": "https://www.slci.in/meghalaya-holiday-list/",
+        "hours": "https://www.slci.in/meghalaya-working-hours/"
+    },
+    "mizoram": {
+        "wages": "https://www.slci.in/minimum-wages/mizoram/",
+        "holidays": "https://www.slci.in/mizoram-holiday-list/"
+    },
+    "madhya pradesh": {
+        "wages": "https://www.slci.in/minimum-wages/madhya-pradesh/",
+        "holidays": "https://www.slci.in/madhya-pradesh-holiday-list/",
+        "hours": "https://www.slci.in/madhya-pradesh-working-hours/"
+    },
+    "nagaland": {
+        "wages": "https://www.slci.in/minimum-wages/nagaland/",
+        "holidays": "https://www.slci.in/nagaland-holiday-list/",
+        "hours": "https://www.slci.in/nagaland-working-hours/"
+    },
+    "odisha": {
+        "wages": "https://www.slci.in/minimum-wages/odisha/",
+        "holidays": "https://www.slci.in/odisha-holiday-list/",
+        "hours": "https://www.slci.in/odisha-working-hours/"
+    },
+    "puducherry": {
+        "wages": "https://www.slci.in/minimum-wages/puducherry/",
+        "holidays": "https://www.slci.in/puducherry-holiday-list/",
+        "hours": "https://www.slci.in/puducherry-working-hours/"
+    },
+    "punjab": {
+        "wages": "https://www.slci.in/minimum-wages/punjab/",
+        "holidays": "https://www.slci.in/punjab-holiday-list/",
+        "hours": "https://www.slci.in/punjab-working-hours/"
+    },
+    "rajasthan": {
+        "wages": "https://www.slci.in/minimum-wages/rajasthan/",
+        "holidays": "https://www.slci.in/rajasthan-holiday-list/",
+        "hours": "https://www.slci.in/rajasthan-working-hours/"
+    },
+    "sikkim": {
+        "wages": "https://www.slci.in/minimum-wages/sikkim/",
+        "holidays": "https://www.slci.in/sikkim-holiday-list/",
+        "hours": "https://www.slci.in/sikkim-working-hours/"
+    },
+    "tamil nadu": {
+        "wages": "https://www.slci.in/minimum-wages/tamil-nadu/",
+        "holidays": "https://www.slci.in/tamil-nadu-holiday-list/",
+        "hours": "https://www.slci.in/tamil-nadu-working-hours/"
+    },
+    "telangana": {
+        "wages": "https://www.slci.in/minimum-wages/telangana/",
+        "holidays": "https://www.slci.in/telangana-holiday-list/",
+        "hours": "https://www.slci.in/telangana-working-hours/"
+    },
+    "tripura": {
+        "wages": "https://www.slci.in/minimum-wages/tripura/",
+        "holidays": "https://www.slci.in/tripura-holiday-list/",
+        "hours": "https://www.slci.in/tripura-working-hours/"
+    },
+    "uttar pradesh": {
+        "wages": "https://www.slci.in/minimum-wages/uttar-pradesh/",
+        "holidays": "https://www.slci.in/uttar-pradesh-holiday-list/",
+        "hours": "https://www.slci.in/uttar-pradesh-working-hours/"
+    },
+    "uttarakhand": {
+        "wages": "https://www.slci.in/minimum-wages/uttarakhand/",
+        "holidays": "https://www.slci.in/uttarakhand-holiday-list/",
+        "hours": "https://www.slci.in/uttarakhand-working-hours/"
+    },
+    "west bengal": {
+        "wages": "https://www.slci.in/minimum-wages/west-bengal/",
+        "holidays": "https://www.slci.in/west-bengal-holiday-list/",
+        "hours": "https://www.slci.in/west-bengal-working-hours/"
+    },
+    "dadra and nagar haveli": {
+        "wages": "https://www.slci.in/dadra-and-nagar-haveli/",
+        "hours": "https://www.slci.in/dadra-and-nagar-haveli-working-hours/"
+    },
+    "arunchal pradesh": {
+        "wages": "https://www.slci.in/arunachal-pradesh/"
+    },
+    "ladakh": {
+        "wages": "https://www.slci.in/minimum-wages/ladakh/"
+    }
 }
 
-STATE_WORKING_HOURS_URLS = {
-    "andaman and nicobar": "https://www.slci.in/andaman-and-nicobar-islands-working-hours/",
-    "andhra pradesh": "https://www.slci.in/andhra-pradesh-working-hours/",
-    "assam": "https://www.slci.in/assam-working-hours/",
-    "bihar": "https://www.slci.in/bihar-working-hours/",
-    "chandigarh": "https://www.slci.in/chandigarh-working-hours/",
-    "chhattisgarh": "https://www.slci.in/chhattisgarh-working-hours/",
-    "dadra and nagar haveli": "https://www.slci.in/dadra-and-nagar-haveli-working-hours/",
-    "daman and diu": "https://www.slci.in/daman-and-diu-working-hours/",
-    "delhi": "https://www.slci.in/delhi-working-hours/",
-    "goa": "https://www.slci.in/goa-working-hours/",
-    "gujarat": "https://www.slci.in/gujarat-working-hours/",
-    "haryana": "https://www.slci.in/haryana-working-hours/",
-    "himachal pradesh": "https://www.slci.in/himachal-pradesh-working-hours/",
-    "jammu and kashmir": "https://www.slci.in/jammu-and-kashmir-working-hours/",
-    "jharkhand": "https://www.slci.in/jharkhand-working-hours/",
-    "karnataka": "https://www.slci.in/karnataka-working-hours/",
-    "kerala": "https://www.slci.in/kerala-working-hours/",
-    "maharashtra": "https://www.slci.in/maharashtra-working-hours/",
-    "manipur": "https://www.slci.in/manipur-working-hours/",
-    "meghalaya": "https://www.slci.in/meghalaya-working-hours/",
-    "madhya pradesh": "https://www.slci.in/madhya-pradesh-working-hours/",
-    "nagaland": "https://www.slci.in/nagaland-working-hours/",
-    "odisha": "https://www.slci.in/odisha-working-hours/",
-    "puducherry": "https://www.slci.in/puducherry-working-hours/",
-    "punjab": "https://www.slci.in/punjab-working-hours/",
-    "rajasthan": "https://www.slci.in/rajasthan-working-hours/",
-    "sikkim": "https://www.slci.in/sikkim-working-hours/",
-    "telangana": "https://www.slci.in/telangana-working-hours/",
-    "tamil nadu": "https://www.slci.in/tamil-nadu-working-hours/",
-    "tripura": "https://www.slci.in/tripura-working-hours/",
-    "uttar pradesh": "https://www.slci.in/uttar-pradesh-working-hours/",
-    "uttarakhand": "https://www.slci.in/uttarakhand-working-hours/",
-    "west bengal": "https://www.slci.in/west-bengal-working-hours/"
-}
+# Per-act views over STATE_URLS used by detection, fetchers and routes. The
+# wage and hours views keep their own state order: detect_state takes the first
+# match in dict order, and the /states dropdowns list states in it.
+MINIMUM_WAGE_STATE_ORDER = (
+    "daman and diu", "arunchal pradesh", "dadra and nagar haveli", "andaman and nicobar", "delhi",
+    "andhra pradesh", "assam", "bihar", "chandigarh", "chhattisgarh", "goa", "gujarat", "haryana",
+    "himachal pradesh", "jammu and kashmir", "jharkhand", "karnataka", "kerala", "ladakh",
+    "madhya pradesh", "maharashtra", "manipur", "meghalaya", "mizoram", "nagaland", "odisha",
+    "puducherry", "punjab", "rajasthan", "sikkim", "tamil nadu", "telangana", "tripura",
+    "uttar pradesh", "uttarakhand", "west bengal",
+)
+WORKING_HOURS_STATE_ORDER = (
+    "andaman and nicobar", "andhra pradesh", "assam", "bihar", "chandigarh", "chhattisgarh",
+    "dadra and nagar haveli", "daman and diu", "delhi", "goa", "gujarat", "haryana",
+    "himachal pradesh", "jammu and kashmir", "jharkhand", "karnataka", "kerala", "maharashtra",
+    "manipur", "meghalaya", "madhya pradesh", "nagaland", "odisha", "puducherry", "punjab",
+    "rajasthan", "sikkim", "telangana", "tamil nadu", "tripura", "uttar pradesh", "uttarakhand",
+    "west bengal",
+)
+STATE_MINIMUM_WAGE_URLS = {state: STATE_URLS[state]["wages"] for state in MINIMUM_WAGE_STATE_ORDER}
+STATE_HOLIDAY_URLS = {state: urls["holidays"] for state, urls in STATE_URLS.items() if "holidays" in urls}
+STATE_WORKING_HOURS_URLS = {state: STATE_URLS[state]["hours"] for state in WORKING_HOURS_STATE_ORDER}
 
 SHOP_ESTABLISHMENT_MAIN_URL = "https://www.slci.in/shops-and-establishments-act/"
 
@@ -2497,6 +3011,130 @@ STATE_VARIATIONS = {
     "uttarakhand": ["uttarakhand", "dehradun", "haridwar", "nainital"],
     "west bengal": ["west bengal", "bengal", "kolkata", "calcutta", "howrah"]
 }
+# Aliases are lowercased/stripped once here; matchers only lowercase the message.
+# Interned so e.g. the "delhi" key and "delhi" alias share one string object
+# with the STATE_URLS keys instead of fresh copies from .lower()
+STATE_VARIATIONS = {
+    sys.intern(state): tuple(sys.intern(v.lower().strip()) for v in variations)
+    for state, variations in STATE_VARIATIONS.items()
+}
+
+def _state_slug_lookup(states):
+    """Canonical state for either its name or its underscored URL form"""
+    lookup = {state.replace(' ', '_'): state for state in states}
+    lookup.update({state: state for state in states})
+    return lookup
+
+# Download routes resolve the <state> path segment with a single dict hit
+MINIMUM_WAGE_STATE_LOOKUP = _state_slug_lookup(STATE_MINIMUM_WAGE_URLS)
+WORKING_HOURS_STATE_LOOKUP = _state_slug_lookup(STATE_WORKING_HOURS_URLS)
+SHOP_ESTABLISHMENT_STATE_LOOKUP = _state_slug_lookup(STATE_VARIATIONS)
+
+# /states/<act_type> answers never change, so their JSON is encoded once here
+STATES_RESPONSE_BODIES = {
+    act_type: app.json.dumpb({"states": list(states), "act_type": act_type})
+    for act_type, states in (
+        ('minimum_wages', STATE_MINIMUM_WAGE_URLS),
+        ('holiday_list', STATE_HOLIDAY_URLS),
+        ('working_hours', STATE_WORKING_HOURS_URLS),
+        ('shop_establishment', STATE_VARIATIONS),
+    )
+}
+
+# Flat alias -> canonical state index, built once at import for O(1) lookups
+STATE_ALIAS_INDEX = {alias: canon for canon, aliases in STATE_VARIATIONS.items() for alias in aliases}
+STATE_ALIAS_INDEX.update({canon: canon for canon in STATE_VARIATIONS})
+
+def _trie_pattern(words):
+    """Regex for a set of literals, factored into a prefix trie.
+
+    The stdlib engine tries alternatives one by one; sharing prefixes lets it
+    reject most words on their first character. At a given position the
+    pattern matches the longest word that occurs there.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def build(node):
+        alts = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not alts:
+            return ''
+        body = alts[0] if len(alts) == 1 else '(?:' + '|'.join(alts) + ')'
+        return '(?:' + body + ')?' if '' in node else body
+
+    return build(trie)
+
+class StateMatcher:
+    """Ordered list of substring checks, resolved with one regex pass per text.
+
+    Each check is (needle, on_message, on_extracted, result); the first check
+    (in list order) whose needle occurs in its target wins, exactly like the
+    nested `in` loops it replaces.
+    """
+
+    def __init__(self, checks):
+        self.scanners = []
+        for target in (1, 2):
+            priority = {}
+            for idx, check in enumerate(checks):
+                if check[target] and check[0] not in priority:
+                    priority[check[0]] = idx
+            if not priority:
+                self.scanners.append(None)
+                continue
+            # The regex reports the longest needle at each position; every
+            # other needle matching there is a prefix of it, so fold the
+            # prefixes' priorities into the reported one
+            best_at = {
+                needle: min(priority[needle[:i]] for i in range(1, len(needle) + 1) if needle[:i] in priority)
+                for needle in priority
+            }
+            rx = re.compile("(?=(" + _trie_pattern(priority) + "))")
+            self.scanners.append((rx, best_at))
+        self.results = [check[3] for check in checks]
+
+    def first(self, message_lower, extracted_state=None):
+        """Return the (state, url) of the first matching check, or (None, None)"""
+        best = None
+        for scanner, text in zip(self.scanners, (message_lower, extracted_state)):
+            if scanner is None or not text:
+                continue
+            rx, best_at = scanner
+            for match in rx.finditer(text):
+                idx = best_at[match.group(1)]
+                if best is None or idx < best:
+                    best = idx
+        return self.results[best] if best is not None else (None, None)
+
+def _url_dict_checks(url_dict):
+    """Checks for the holiday / working-hours matching order"""
+    checks = []
+    for state, url in url_dict.items():
+        checks.append((state, True, True, (state, url)))
+        checks.extend((v, True, False, (state, url)) for v in STATE_VARIATIONS.get(state, ()))
+    return checks
+
+STATE_MATCHERS = {
+    "minimum_wages": StateMatcher(
+        [(state, True, False, (state, url)) for state, url in STATE_MINIMUM_WAGE_URLS.items()]
+        + [(v, True, True, (state, STATE_MINIMUM_WAGE_URLS.get(state)))
+           for state, variations in STATE_VARIATIONS.items() for v in variations]
+    ),
+    "holiday_list": StateMatcher(_url_dict_checks(STATE_HOLIDAY_URLS)),
+    "working_hours": StateMatcher(_url_dict_checks(STATE_WORKING_HOURS_URLS)),
+    "shop_establishment": StateMatcher(
+        [(state, True, False, (state, SHOP_ESTABLISHMENT_MAIN_URL)) for state in STATE_VARIATIONS]
+        + [(v, True, False, (state, SHOP_ESTABLISHMENT_MAIN_URL))
+           for state, variations in STATE_VARIATIONS.items() for v in variations]
+        + [check for state, variations in STATE_VARIATIONS.items()
+           for check in [(state, False, True, (state, SHOP_ESTABLISHMENT_MAIN_URL))]
+           + [(v, False, True, (state, SHOP_ESTABLISHMENT_MAIN_URL)) for v in variations]]
+    ),
+}
 
 # ============================================================================
 # UPDATED SERVICES DATA (With Descriptions)
@@ -2512,6 +3150,17 @@ SERVICES_DATA = [
     {"title": "Background Verification", "description": "Verifying candidate credentials, employment history, and records to ensure authenticity and reduce hiring risks."},
     {"title": "Staffing", "description": "Providing skilled manpower solutions to meet short-term, long-term, or project-based workforce requirements."}
 ]
+SERVICES_DATA = tuple(MappingProxyType(service) for service in SERVICES_DATA)
+
+def _render_services_html(services):
+    """Services list reply for the chat widget"""
+    return "".join([
+        """<div style="font-family: Arial, sans-serif; padding: 15px; background: linear-gradient(135deg, #f5f7fa 0%, #e9ecef 100%); border-radius: 10px; max-height: 500px; overflow-y: auto;"><h4 style="color: #1a237e; margin-bottom: 15px; display: flex; align-items: center; gap: 8px;"><i class="fas fa-briefcase" style="color: #667eea;"></i> Our Services</h4><div style="display: grid; grid-template-columns: 1fr; gap: 15px;">""",
+        *[f"""<div style="background: white; padding: 15px; border-radius: 8px; border-left: 4px solid #667eea; box-shadow: 0 2px 5px rgba(0,0,0,0.05);"><div style="display: flex; align-items: flex-start; gap: 10px; flex-direction: column;"><h5 style="margin: 0; color: #1a237e; font-size: 16px;">{service['title']}</h5><p style="margin: 5px 0 0; color: #555; font-size: 14px; line-height: 1.5;">{service['description']}</p><button onclick="openServiceModal('{service['title']}')" style="background: #667eea; color: white; border: none; padding: 8px 15px; border-radius: 5px; cursor: pointer; font-size: 13px; transition: all 0.3s; align-self: flex-start; margin-top: 10px;"><i class="fas fa-envelope"></i> Enquire</button></div></div>""" for service in services],
+        """</div><p style="margin-top: 15px; color: #666; font-size: 12px; text-align: center;">Click "Enquire" button next to any service to get detailed information</p></div>""",
+    ])
+
+SERVICES_HTML = _render_services_html(SERVICES_DATA)
 
 # ============================================================================
 # ESI & EPF INFORMATION
@@ -2529,9 +3178,9 @@ RESPONSES = {
     "full form of slci": "SLCI stands for Shakti Legal Compliance India. 'Shakti' represents strength in Sanskrit.",
     "contact number": "📞 Mobile: +91 9999329153 | Mobile :- 8373917131",
     "email": "contact@slci.in",
-    "address": """<div style="background: #f8f9fa; padding: 20px; border-radius: 10px; border-left: 4px solid #667eea;"><h3 style="color: #667eea; margin-top: 0;">📍 Our Office Address</h3><p style="color: #333; font-size: 16px; line-height: 1.6; margin: 15px 0;">83, DSIDC COMPLEX,<br>Okhla I Rd, Pocket C,<br>Okhla Phase I, Okhla Industrial Estate,<br>New Delhi, Delhi 110020</p><div style="margin: 20px 0; border-radius: 8px; overflow: hidden; box-shadow: 0 2px 8px rgba(0,0,0,0.1);"><iframe src="https://www.google.com/maps/embed?pb=!1m18!1m12!1m3!1d3502.1234567890123!2d77.2818578!3d28.525507!2m3!1f0!2f0!3f0!3m2!1i1024!2i768!4f13.1!3m3!1m2!1s0x390ce1b166f71281%3A0x78602061339ccb61!2sShakti%20Legal%20Compliance%20India%20(SLCI)!5e0!3m2!1sen!2sin!4v1234567890123!5m2!1sen!2sin" width="100%" height="300" style="border:0;" allowfullscreen="" loading="lazy" referrerpolicy="no-referrer-when-downgrade"></iframe></div><div style="text-align: center; margin-top: 20px;"><a href="https://www.google.com/maps/place/Shakti+Legal+Compliance+India+(SLCI)/@28.5253303,77.2827107,18z/data=!3m1!4b1!4m6!3m5!1s0x390ce1b166f71281:0x78602061339ccb61!8m2!3d28.525507!4d77.2818578!16s%2Fg%2F11j0ww1tn5?entry=ttu" target="_blank" style="display: inline-block; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 12px 30px; text-decoration: none; border-radius: 25px; font-weight: 600; box-shadow: 0 4px 15px rgba(102, 126, 234, 0.4); transition: all 0.3s ease;">🗺️ Click here to open in Google Maps</a></div></div>""",
-    "timing": """<div style="background: #f8f9fa; padding: 20px; border-radius: 10px; border-left: 4px solid #667eea;"><h3 style="color: #667eea; margin-top: 0;">🕒 Office Timing</h3><p style="color: #333; font-size: 16px; line-height: 1.8; margin: 15px 0;"><strong>Monday - Saturday:</strong> 9:00 AM to 6:00 PM<br><strong>Sunday:</strong> Closed</p><p style="color: #666; font-size: 14px; margin-top: 15px; font-style: italic;">* We recommend scheduling appointments in advance for personalized consultation.</p></div>""",
-    "why slci": """<div style="background: linear-gradient(135deg, #667eea15 0%, #764ba215 100%); padding: 25px; border-radius: 12px; border: 1px solid #667eea30;"><h3 style="color: #667eea; margin-top: 0;">✨ Why Choose SLCI?</h3><div style="margin: 20px 0;"><p style="color: #333; font-size: 18px; font-weight: 600; margin: 10px 0;">🏆 38+ Years of Experience in the Field of Law</p><p style="color: #555; font-size: 15px; line-height: 1.7; margin: 15px 0;">We help clients achieve their goals by providing <strong>high-quality, ethically sound legal counsel</strong> and <strong>strategic advice</strong> tailored to your business needs.</p></div><div style="display: grid; grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); gap: 15px; margin: 20px 0;"><div style="background: white; padding: 15px; border-radius: 8px; box-shadow: 0 2px 6px rgba(0,0,0,0.08);"><strong style="color: #667eea;">✅</strong> Expert Legal Team</div><div style="background: white; padding: 15px; border-radius: 8px; box-shadow: 0 2px 6px rgba(0,0,0,0.08);"><strong style="color: #667eea;">✅</strong> Pan-India Coverage</div><div style="background: white; padding: 15px; border-radius: 8px; box-shadow: 0 2px 6px rgba(0,0,0,0.08);"><strong style="color: #667eea;">✅</strong> 24/7 Support</div><div style="background: white; padding: 15px; border-radius: 8px; box-shadow: 0 2px 6px rgba(0,0,0,0.08);"><strong style="color: #667eea;">✅</strong> Cost-Effective Solutions</div></div><p style="color: #667eea; font-weight: 500; margin-top: 20px; text-align: center;">🤝 Your Compliance Partner for Growth & Peace of Mind</p></div>""",
+    "address": """<div class="info-card"><h3 class="info-title">📍 Our Office Address</h3><p style="color: #333; font-size: 16px; line-height: 1.6; margin: 15px 0;">83, DSIDC COMPLEX,<br>Okhla I Rd, Pocket C,<br>Okhla Phase I, Okhla Industrial Estate,<br>New Delhi, Delhi 110020</p><div style="margin: 20px 0; border-radius: 8px; overflow: hidden; box-shadow: 0 2px 8px rgba(0,0,0,0.1);"><iframe src="https://www.google.com/maps/embed?pb=!1m18!1m12!1m3!1d3502.1234567890123!2d77.2818578!3d28.525507!2m3!1f0!2f0!3f0!3m2!1i1024!2i768!4f13.1!3m3!1m2!1s0x390ce1b166f71281%3A0x78602061339ccb61!2sShakti%20Legal%20Compliance%20India%20(SLCI)!5e0!3m2!1sen!2sin!4v1234567890123!5m2!1sen!2sin" width="100%" height="300" style="border:0;" allowfullscreen="" loading="lazy" referrerpolicy="no-referrer-when-downgrade"></iframe></div><div style="text-align: center; margin-top: 20px;"><a href="https://www.google.com/maps/place/Shakti+Legal+Compliance+India+(SLCI)/@28.5253303,77.2827107,18z/data=!3m1!4b1!4m6!3m5!1s0x390ce1b166f71281:0x78602061339ccb61!8m2!3d28.525507!4d77.2818578!16s%2Fg%2F11j0ww1tn5?entry=ttu" target="_blank" style="display: inline-block; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 12px 30px; text-decoration: none; border-radius: 25px; font-weight: 600; box-shadow: 0 4px 15px rgba(102, 126, 234, 0.4); transition: all 0.3s ease;">🗺️ Click here to open in Google Maps</a></div></div>""",
+    "timing": """<div class="info-card"><h3 class="info-title">🕒 Office Timing</h3><p style="color: #333; font-size: 16px; line-height: 1.8; margin: 15px 0;"><strong>Monday - Saturday:</strong> 9:00 AM to 6:00 PM<br><strong>Sunday:</strong> Closed</p><p style="color: #666; font-size: 14px; margin-top: 15px; font-style: italic;">* We recommend scheduling appointments in advance for personalized consultation.</p></div>""",
+    "why slci": """<div style="background: linear-gradient(135deg, #667eea15 0%, #764ba215 100%); padding: 25px; border-radius: 12px; border: 1px solid #667eea30;"><h3 class="info-title">✨ Why Choose SLCI?</h3><div style="margin: 20px 0;"><p style="color: #333; font-size: 18px; font-weight: 600; margin: 10px 0;">🏆 38+ Years of Experience in the Field of Law</p><p style="color: #555; font-size: 15px; line-height: 1.7; margin: 15px 0;">We help clients achieve their goals by providing <strong>high-quality, ethically sound legal counsel</strong> and <strong>strategic advice</strong> tailored to your business needs.</p></div><div style="display: grid; grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); gap: 15px; margin: 20px 0;"><div class="feature-tile"><strong style="color: #667eea;">✅</strong> Expert Legal Team</div><div class="feature-tile"><strong style="color: #667eea;">✅</strong> Pan-India Coverage</div><div class="feature-tile"><strong style="color: #667eea;">✅</strong> 24/7 Support</div><div class="feature-tile"><strong style="color: #667eea;">✅</strong> Cost-Effective Solutions</div></div><p style="color: #667eea; font-weight: 500; margin-top: 20px; text-align: center;">🤝 Your Compliance Partner for Growth & Peace of Mind</p></div>""",
     "minimum wages": "Minimum wages vary by state. Please specify a state (e.g., 'Minimum wages of Delhi').",
     "working hours": "Working hours vary by state. Please specify a state (e.g., 'Working hours of Delhi').",
     "holiday list": "Holiday lists vary by state. Please specify a state (e.g., 'Holiday list of Maharashtra').",
@@ -2546,6 +3195,13 @@ RESPONSES = {
     "website": "www.slci.in | Blog: www.slci.in/blog | Knowledge Centre: www.slci.in/knowledge-centre",
     "new labour codes": "The New Labour Codes are four consolidated codes replacing 44+ old labour laws, implemented from 21st November 2025. They cover: Code on Social Security 2020, Industrial Relations Code 2020, Code on Wages 2019, and Occupational Safety, Health & Working Conditions Code 2020."
 }
+RESPONSES = MappingProxyType(RESPONSES)
+
+# EPF/ESI replies carry a related-services panel; rendered once here
+ESI_EPF_REPLIES = {
+    key: f"""<div style="font-family: Arial, sans-serif;"><p>{RESPONSES.get(key, "")}</p><div style="margin-top: 15px; background: #f5f7fa; padding: 15px; border-radius: 8px;"><h4 style="color: #1a237e;">Related Services:</h4><ul style="list-style-type: none; padding: 0;"><li style="margin: 5px 0;">✅ Registration of Employees</li><li style="margin: 5px 0;">✅ Generation of Challans</li><li style="margin: 5px 0;">✅ Monthly Compliance Reports</li></ul></div></div>"""
+    for key in ("epf", "esi")
+}
 
 # ============================================================================
 # KEYWORDS FOR INTENT DETECTION
@@ -2572,29 +3228,155 @@ KEYWORDS = {
     "website": ["website", "site", "web", "url", "online", "portal"],
     "new labour codes":["new labour codes", "labour codes", "new labor codes", "labor codes", "new labour laws", "new labor laws", "labour code", "labor code", "code on social security", "social security code", "industrial relations code", "code on wages", "occupational safety code"]
 }
+# Phrases are lowercased/stripped once here; matchers only lowercase the message
+KEYWORDS = {intent: tuple(p.lower().strip() for p in phrases) for intent, phrases in KEYWORDS.items()}
+
+def _phrase_groups_re(phrase_groups):
+    """Single compiled multi-pattern matcher with one named group per phrase group.
+
+    The lookahead makes matches zero-width so overlapping phrases are all seen
+    in one left-to-right pass of the C regex engine.
+    """
+    return re.compile("(?=(?:" + "|".join(
+        f"(?P<k{idx}>" + "|".join(re.escape(p) for p in phrases) + ")"
+        for idx, phrases in enumerate(phrase_groups)
+    ) + "))")
+
+def _first_phrase_group(pattern, message):
+    """Index of the earliest-listed group with a phrase in message, else None"""
+    best = None
+    for match in pattern.finditer(message):
+        idx = int(match.lastgroup[1:])
+        if best is None or idx < best:
+            best = idx
+            if idx == 0:
+                break
+    return best
+
+_KEYWORD_INTENTS = list(KEYWORDS)
+_KEYWORD_RE = _phrase_groups_re(KEYWORDS.values())
+
+def _scan_keyword_intent(message):
+    """Return the first KEYWORDS intent (in dict order) with a phrase in message"""
+    best = _first_phrase_group(_KEYWORD_RE, message)
+    return _KEYWORD_INTENTS[best] if best is not None else None
+
+# Inverted index phrase -> intent. Values come from the full scan so a message
+# that is exactly one phrase ("epf", "office hours") resolves the same way
+# with a single dict hit.
+PHRASE_TO_INTENT = {p: _scan_keyword_intent(p) for phrases in KEYWORDS.values() for p in phrases}
+
+def match_keyword_intent(message):
+    """Resolve the KEYWORDS intent for an already-lowercased message"""
+    intent = PHRASE_TO_INTENT.get(message)
+    if intent is not None:
+        return intent
+    return _scan_keyword_intent(message)
+
+@lru_cache(maxsize=2048)
+def resolve_intent(norm_msg):
+    """Memoized (intent, response text) for a lowercased, whitespace-collapsed message"""
+    intent = match_keyword_intent(norm_msg)
+    if intent is None:
+        return None, None
+    return intent, RESPONSES.get(intent, "")
+
+# Topic triggers checked by chat() before KEYWORDS, in priority order
+CHAT_TOPICS = {
+    "shop_establishment": ("shop and establishment", "shop establishment", "shop & establishment", "sea act"),
+    "holiday_list": ("holiday",),
+    "working_hours": ("working hours", "working hour"),
+    "minimum_wages": ("minimum wage", "minimum wages"),
+    "new_labour_codes": ("new labour codes", "new labor codes", "labour codes", "labor codes", "new labour laws",
+                         "new labor laws", "code on social security", "social security code", "industrial relations code",
+                         "code on wages", "wages code", "occupational safety code", "osh code", "labour code 2020"),
+    "services": ("services of slci", "what does slci do", "your services", "services you offer", "list of services", "slci services"),
+}
+_CHAT_TOPIC_NAMES = list(CHAT_TOPICS)
+_CHAT_TOPIC_RE = _phrase_groups_re(CHAT_TOPICS.values())
+
+def match_chat_topic(message):
+    """First CHAT_TOPICS topic (in priority order) triggered by a lowercased message"""
+    best = _first_phrase_group(_CHAT_TOPIC_RE, message)
+    return _CHAT_TOPIC_NAMES[best] if best is not None else None
+
+_LABOUR_CODE_KEYS = list(NEW_LABOUR_CODES)
+_LABOUR_CODE_RE = _phrase_groups_re(code["keywords"] for code in NEW_LABOUR_CODES.values())
+
+def match_labour_code(message):
+    """First NEW_LABOUR_CODES key (in dict order) with a keyword in message"""
+    best = _first_phrase_group(_LABOUR_CODE_RE, message)
+    return _LABOUR_CODE_KEYS[best] if best is not None else None
 
 # ============================================================================
 # INPUT VALIDATION & SANITIZATION
 # ============================================================================
+_EMAIL_RE = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
+_TAG_RE = re.compile(r'<[^>]+>')
+
+# Required form fields per endpoint, in the order they are reported when missing
+DOWNLOAD_REQUIRED_FIELDS = ('fullName', 'companyName', 'email', 'contactNumber', 'state', 'actType')
+SERVICE_ENQUIRY_REQUIRED_FIELDS = ('fullName', 'companyName', 'email', 'contactNumber', 'service', 'query')
+FEE_ENQUIRY_REQUIRED_FIELDS = ('fullName', 'companyName', 'email', 'contactNumber', 'description')
+ENQUIRY_REQUIRED_FIELDS = ('fullName', 'email', 'contactNumber', 'query')
+
+def first_missing_field(data, fields):
+    """Return the first field in `fields` that is absent or empty in data, else None"""
+    return next((field for field in fields if not data.get(field)), None)
+
 def validate_email(email):
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(pattern, email) is not None
+    return _EMAIL_RE.fullmatch(email) is not None
 
 def validate_phone(phone):
-    clean_phone = re.sub(r'[\s\-\(\)\+]', '', phone)
-    pattern = r'^[6-9]\d{9}$'
-    return re.match(pattern, clean_phone) is not None
+    # Separators become spaces so one split() drops them along with the same
+    # Unicode whitespace \s matched; isdecimal() accepts exactly what \d did
+    clean_phone = "".join(phone.replace('-', ' ').replace('(', ' ').replace(')', ' ').replace('+', ' ').split())
+    return len(clean_phone) == 10 and clean_phone[0] in "6789" and clean_phone.isdecimal()
 
 def sanitize_input(text):
     if not text:
         return text
-    text = re.sub(r'<[^>]+>', '', text)
-    text = text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+    if '<' in text:  # most input has no tags; skip the regex then
+        text = _TAG_RE.sub('', text)
+    text = html_escape(text, quote=False)
     return text.strip()
 
 # ============================================================================
 # HEALTH CHECK ENDPOINT (Add this BEFORE the startup code)
 # ============================================================================
+DB_CHECK_TTL = 10  # seconds a /db-check snapshot is reused for
+DB_CHECK_TABLES = ['downloads', 'service_enquiries', 'fee_enquiries', 'download_stats']
+
+@lru_cache(maxsize=1)
+def _db_check_snapshot(bucket):
+    """Serialized /db-check JSON body; cached per DB_CHECK_TTL time bucket"""
+    with get_db_pool().connection() as conn:
+        with conn.cursor() as cur:
+            # Check if tables exist
+            cur.execute("""
+                SELECT table_name 
+                FROM information_schema.tables 
+                WHERE table_schema = 'public'
+            """)
+            tables = [t[0] for t in cur.fetchall()]
+            
+            # Approximate live row counts from the stats collector in one
+            # round-trip instead of a full COUNT(*) scan per table
+            cur.execute("""
+                SELECT relname, n_live_tup
+                FROM pg_stat_user_tables
+                WHERE schemaname = 'public' AND relname = ANY(%s)
+            """, (DB_CHECK_TABLES,))
+            live_counts = dict(cur.fetchall())
+            counts = {table: live_counts.get(table, 0) for table in DB_CHECK_TABLES}
+    return orjson.dumps({
+        "status": "healthy" if tables else "no_tables",
+        "database": DB_NAME,
+        "host": DB_HOST,
+        "tables": tables,
+        "counts": counts
+    })
+
 @app.route("/db-check", methods=["GET"])
 def db_check():
     """Simple database check endpoint"""
@@ -2603,32 +3385,9 @@ def db_check():
         if not pool:
             return jsonify({"status": "error", "message": "No database pool"}), 500
         
-        with pool.connection() as conn:
-            with conn.cursor() as cur:
-                # Check if tables exist
-                cur.execute("""
-                    SELECT table_name 
-                    FROM information_schema.tables 
-                    WHERE table_schema = 'public'
-                """)
-                tables = [t[0] for t in cur.fetchall()]
-                
-                # Get counts
-                counts = {}
-                for table in ['downloads', 'service_enquiries', 'fee_enquiries', 'download_stats']:
-                    if table in tables:
-                        cur.execute(f"SELECT COUNT(*) FROM {table}")
-                        counts[table] = cur.fetchone()[0]
-                    else:
-                        counts[table] = 0
-                
-                return jsonify({
-                    "status": "healthy" if tables else "no_tables",
-                    "database": DB_NAME,
-                    "host": DB_HOST,
-                    "tables": tables,
-                    "counts": counts
-                })
+        # Back-to-back health probes share one pre-serialized body per TTL window
+        body = _db_check_snapshot(int(time.time()) // DB_CHECK_TTL)
+        return app.response_class(body, mimetype='application/json')
     except Exception as e:
         return jsonify({
             "status": "error",
@@ -2648,41 +3407,54 @@ print(f"🐍 Python Version: {sys.version}")
 print(f"🌍 Environment: {'Render' if os.environ.get('RENDER') else 'Local'}")
 print("=" * 60)
 
-# Initialize database immediately on module load (works on Render)
-try:
-    print("📊 Initializing database...")
-    db_result = init_db()
-    if db_result:
-        print("✅ Database initialized successfully")
-    else:
-        print("⚠️ Database initialization returned False")
-except Exception as e:
-    print(f"❌ Database initialization error: {e}")
-    import traceback
-    traceback.print_exc()
-
-# Check Ollama connection
-try:
-    if check_ollama_connection():
-        print(f"✅ Ollama connected: {OLLAMA_MODEL}")
-    else:
-        print("⚠️ Ollama not available - using keyword responses")
-except Exception as e:
-    print(f"⚠️ Ollama check failed: {e}")
+STARTUP_THREAD_NAME = "slci-startup"
 
-# Check Google Sheets
-if GOOGLE_SHEET_ENABLED:
-    print(f"✅ Google Sheets enabled: {GOOGLE_SHEET_ID}")
-    if os.path.exists(GOOGLE_CREDENTIALS_PATH):
-        print(f"✅ Credentials found: {GOOGLE_CREDENTIALS_PATH}")
+def _startup():
+    """Slow startup work (DB init, Ollama probe, Sheets check) run off the import path"""
+    # Initialize database (works on Render)
+    try:
+        print("📊 Initializing database...")
+        db_result = init_db()
+        if db_result:
+            print("✅ Database initialized successfully")
+        else:
+            print("⚠️ Database initialization returned False")
+    except Exception as e:
+        print(f"❌ Database initialization error: {e}")
+        traceback.print_exc()
+    finally:
+        db_ready.set()
+
+    # Check Ollama connection
+    try:
+        if check_ollama_connection():
+            print(f"✅ Ollama connected: {OLLAMA_MODEL}")
+        else:
+            print("⚠️ Ollama not available - using keyword responses")
+    except Exception as e:
+        print(f"⚠️ Ollama check failed: {e}")
+
+    # Check Google Sheets
+    if GOOGLE_SHEET_ENABLED:
+        print(f"✅ Google Sheets enabled: {GOOGLE_SHEET_ID}")
+        if os.path.exists(GOOGLE_CREDENTIALS_PATH):
+            print(f"✅ Credentials found: {GOOGLE_CREDENTIALS_PATH}")
+        else:
+            print(f"⚠️ Credentials file missing: {GOOGLE_CREDENTIALS_PATH}")
     else:
-        print(f"⚠️ Credentials file missing: {GOOGLE_CREDENTIALS_PATH}")
-else:
-    print("ℹ️ Google Sheets disabled")
+        print("ℹ️ Google Sheets disabled")
 
-print("=" * 60)
-print("✅ Initialization complete! Ready to handle requests.")
-print("=" * 60)
+    print("=" * 60)
+    print("✅ Initialization complete! Ready to handle requests.")
+    print("=" * 60)
+
+# Worker starts accepting requests (e.g. /health) immediately; DB handlers
+# wait on db_ready inside get_db_pool()
+Thread(target=_startup, name=STARTUP_THREAD_NAME, daemon=True).start()
+Thread(target=_sheet_worker, name="slci-sheets", daemon=True).start()
+Thread(target=_scrape_refresher, name="slci-scrape-refresh", daemon=True).start()
+Thread(target=_email_worker, name="slci-email", daemon=True).start()
+Thread(target=_enquiry_writer, name="slci-enquiries", daemon=True).start()
 
 # ============================================================================
 # MAIN ENTRY POINT - This runs ONLY when executing python app.py directly
@@ -2699,5 +3471,5 @@ if __name__ == "__main__":
     print(f"🌐 URL: http://0.0.0.0:{port}")
     print("=" * 60 + "\n")
     
-    # Run the app
-    app.run(host='0.0.0.0', port=port, debug=debug_mode)
\ No newline at end of file
+    # Local runs only - production is served by gunicorn (see Procfile)
+    app.run(host='0.0.0.0', port=port, debug=debug_mode, threaded=True)
\ No newline at end of file